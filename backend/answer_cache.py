@@ -0,0 +1,178 @@
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from catalog import file_version
+
+# Модель, которая уже используется в accuracy.py для сравнения ответов
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s-]")
+# Числа и латиница (номера заказов, 'Base', 'vol.2') должны совпадать дословно,
+# иначе «Заказ TCH-250210-01» и «Заказ TCH-250211-02» эмбеддинги посчитают одним вопросом
+_STRICT_TOKEN_RE = re.compile(r"[0-9a-z][0-9a-z-]*")
+# Ответы-заглушки («не нашёл», «нет такого чая», агент сдался по лимиту итераций) не кешируем:
+# после правки каталога они станут неверными, а держались бы в кеше весь ttl
+_FALLBACK_RE = re.compile(
+    r"не наш[её]л|не найден|нет так(?:ого|ой|их)|нет товаров|не знаю|к сожалению|^agent stopped",
+    re.IGNORECASE,
+)
+
+
+def normalize_question(text: str) -> str:
+    """Ключ точного совпадения: нижний регистр, ё/е, без пунктуации и лишних пробелов."""
+    text = text.lower().replace("ё", "е")
+    return " ".join(_PUNCTUATION_RE.sub(" ", text).split())
+
+
+def is_fallback_answer(answer: str) -> bool:
+    """Пустой ответ или ответ-заглушка, который нельзя отдавать из кеша."""
+    return not answer or not answer.strip() or _FALLBACK_RE.search(answer.strip()) is not None
+
+
+class _Entry:
+    __slots__ = ("answer", "created", "embedding", "strict_tokens")
+
+    def __init__(self, answer: str, created: float, embedding: Any, strict_tokens: frozenset):
+        self.answer = answer
+        self.created = created
+        self.embedding = embedding
+        self.strict_tokens = strict_tokens
+
+
+class AnswerCache:
+    """
+    Кеш готовых ответов агента перед process_query_with_agent.
+      - точный уровень: нормализованный вопрос -> ответ;
+      - семантический уровень (semantic=True): ближайший по эмбеддингу вопрос
+        с косинусным сходством не ниже similarity_threshold;
+      - LRU-вытеснение (max_entries) и время жизни записи (ttl, секунды);
+      - весь кеш сбрасывается, когда меняется любой из watch_paths
+        (tea_data.json, orders.json, similar_products.json или база заказов).
+    """
+    def __init__(
+        self,
+        watch_paths: Sequence[str],
+        max_entries: int = 1024,
+        ttl: Optional[float] = 3600,
+        semantic: bool = False,
+        similarity_threshold: float = 0.95,
+        embedder: Optional[Callable[[List[str]], Any]] = None,
+    ):
+        self.watch_paths = [path for path in watch_paths if path]
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.semantic = semantic
+        self.similarity_threshold = similarity_threshold
+        self._embedder = embedder
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._version = self._catalog_version()
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {
+            "hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expired": 0,
+            "invalidations": 0,
+        }
+
+    # ---------------------- Версия каталогов ----------------------
+
+    def _catalog_version(self) -> Tuple:
+        return tuple(file_version(path) if os.path.exists(path) else None for path in self.watch_paths)
+
+    def _check_version(self) -> None:
+        """Сбрасывает кеш, если какой-то из файлов изменился (вызывать под блокировкой)."""
+        version = self._catalog_version()
+        if version != self._version:
+            if self._entries:
+                self.counters["invalidations"] += 1
+            self._entries.clear()
+            self._version = version
+
+    # ---------------------- Эмбеддинги ----------------------
+
+    def _embed(self, text: str) -> Any:
+        if self._embedder is None:
+            # Импорт здесь: sentence-transformers нужен только семантическому уровню
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(DEFAULT_EMBEDDING_MODEL)
+            self._embedder = lambda texts: model.encode(texts, normalize_embeddings=True)
+        return self._embedder([text])[0]
+
+    def _find_similar(self, embedding: Any, strict_tokens: frozenset) -> Optional[Tuple[str, _Entry]]:
+        import numpy as np
+
+        candidates = [
+            (key, entry) for key, entry in self._entries.items()
+            if entry.embedding is not None and entry.strict_tokens == strict_tokens
+        ]
+        if not candidates:
+            return None
+        matrix = np.stack([entry.embedding for _, entry in candidates])
+        similarities = matrix @ embedding
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+        return candidates[best]
+
+    # ---------------------- Публичный интерфейс ----------------------
+
+    def get(self, question: str) -> Optional[str]:
+        key = normalize_question(question)
+        embedding = self._embed(key) if self.semantic else None
+
+        with self._lock:
+            self._check_version()
+
+            entry = self._entries.get(key)
+            counter = "hits"
+            if entry is None and embedding is not None:
+                found = self._find_similar(embedding, frozenset(_STRICT_TOKEN_RE.findall(key)))
+                if found is not None:
+                    key, entry = found
+                    counter = "semantic_hits"
+
+            if entry is not None and self.ttl is not None and time.monotonic() - entry.created > self.ttl:
+                del self._entries[key]
+                self.counters["expired"] += 1
+                entry = None
+
+            if entry is None:
+                self.counters["misses"] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.counters[counter] += 1
+            return entry.answer
+
+    def put(self, question: str, answer: str) -> None:
+        if is_fallback_answer(answer):
+            return
+        key = normalize_question(question)
+        embedding = self._embed(key) if self.semantic else None
+        entry = _Entry(answer, time.monotonic(), embedding, frozenset(_STRICT_TOKEN_RE.findall(key)))
+
+        with self._lock:
+            self._check_version()
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Счётчики попаданий/промахов и текущий размер кеша."""
+        with self._lock:
+            lookups = self.counters["hits"] + self.counters["semantic_hits"] + self.counters["misses"]
+            hit_rate = (lookups - self.counters["misses"]) / lookups if lookups else 0.0
+            return dict(self.counters, size=len(self._entries), hit_rate=hit_rate)
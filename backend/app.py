@@ -1,27 +1,45 @@
 import os
 import json
-from flask import Flask, request, jsonify
+import asyncio
+import logging
+import queue
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 
 # LangChain импорт
 from langchain.docstore.document import Document
 
-# Модель GigaChat (кастомный класс)
-from langchain_gigachat.chat_models import GigaChat
+# Модель GigaChat (общий клиент, см. gigachat_client.py)
+from gigachat_client import get_chat_model
 
 # Prompt, инструменты и агенты
 from langchain.prompts import PromptTemplate
 from langchain.agents import create_react_agent, Tool, AgentExecutor
 from langchain.tools import BaseTool
-from langchain.memory import ConversationBufferMemory
 
 from typing import Any
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
 import re
 from langchain.schema import AgentAction, AgentFinish
 from langchain.agents.agent import AgentOutputParser
 from typing import Union
 
+# Общее хранилище JSON-каталогов (читает файл один раз, перечитывает при изменении)
+from catalog import catalog_store
+from indexes import TasteIndex, split_tastes, search_by_name, FUZZY_RESULTS_HEADER
+from product_index import DEFAULT_TOP_K, ProductEmbeddingIndex
+from order_store import OrderBackend, JSONOrderBackend, SQLiteOrderBackend
+from router import IntentRouter
+from answer_cache import AnswerCache
+from session_memory import DEFAULT_SESSION_ID, SessionMemoryStore
+from conversation_log import ConversationLogger
+from replay_llm import llm_from_env
+from streaming import FINAL_ANSWER_MARKER, FinalAnswerStreamDetector, StreamingEventHandler, format_sse
+from telemetry import (
+    METRICS_CONTENT_TYPE, TraceCallbackHandler, annotate, log, registry, request_trace, set_route, span,
+)
+
 app = Flask(__name__)
 CORS(app)
 
@@ -34,7 +52,7 @@ from langchain.tools import BaseTool
 
 class JSONNameSearchTool(BaseTool):
     """
-    Инструмент, который загружает JSON и ищет *строго/частично* по 'Название' товара.
+    Инструмент, который берёт JSON из общего хранилища каталогов и ищет *строго/частично/с опечатками* по 'Название' товара.
     Возвращает найденные записи (название + значение указанного ключа) в текстовом виде.
     """
     name: str = "json_name_search"
@@ -47,7 +65,7 @@ class JSONNameSearchTool(BaseTool):
     json_path: str
 
     def _run(self, query: str) -> str:
-        print(f"[DEBUG] Tool '{self.name}' called with input: {query}")
+        log.debug("Tool '%s' called with input: %s", self.name, query)
 
         # Проверяем, что у нас действительно есть два элемента: название и ключ
         parts = query.split(",", 1)
@@ -59,41 +77,44 @@ class JSONNameSearchTool(BaseTool):
         key = key.strip()
 
         try:
-            with open(self.json_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            catalog = catalog_store.get(self.json_path)
+            # Точное совпадение нормализованного названия, иначе частичное, иначе с опечатками
+            positions, fuzzy = search_by_name(catalog, raw_name, 'Название')
+            annotate(catalog_size=len(catalog), matches=len(positions), fuzzy=fuzzy)
         except Exception as e:
             result = f"Ошибка при чтении JSON: {e}"
-            print(f"[DEBUG] Tool '{self.name}' output: {result}")
+            log.debug("Tool '%s' output: %s", self.name, result)
             return result
 
-        name_lower = raw_name.lower()
-        results = []
-        for idx, item in enumerate(data, start=1):
+        results = [FUZZY_RESULTS_HEADER] if fuzzy and positions else []
+        for pos in positions:
+            item = catalog.records[pos]
             name = item.get('Название', '')
-            # Проверка на частичное совпадение искомого названия
-            if name_lower in name.lower():
-                # Извлекаем значение указанного ключа
-                value = item.get(key, "Поле не найдено")
-                snippet = f"Название: {name}\n{key}: {value}"
-                results.append(f"[doc {idx}] {snippet}")
+            # Извлекаем значение указанного ключа
+            value = item.get(key, "Поле не найдено")
+            snippet = f"Название: {name}\n{key}: {value}"
+            results.append(f"[doc {pos + 1}] {snippet}")
 
         if not results:
             result = ""
         else:
             result = "\n".join(results)
 
-        print(f"[DEBUG] Tool '{self.name}' output: {result}")
+        log.debug("Tool '%s' output: %s", self.name, result)
         return result
 
     async def _arun(self, query: str) -> str:
-        raise NotImplementedError("Async not implemented")
+        # Поиск идёт по индексам в памяти и занимает микросекунды —
+        # выполняем прямо в event loop, без передачи в поток
+        return self._run(query)
 
 
 
 
 class JSONOrderSearchTool(BaseTool):
     """
-    Инструмент, который загружает JSON и ищет заказы по 'Номер заказа'.
+    Инструмент, который ищет заказы по 'Номер заказа' в хранилище заказов
+    (orders.json или SQLite, см. order_store.py).
     Возвращает найденные записи (номер заказа, состав, статус, даты) в текстовом виде.
     """
     name: str = "json_order_search"
@@ -101,55 +122,57 @@ class JSONOrderSearchTool(BaseTool):
         "Поиск заказа по номеру (для статуса, даты доставки и т.п.). "
         "Используй, если пользователь спрашивает про заказ."
     )
-    json_path: str
+    order_backend: OrderBackend
+    # Сколько заказов максимум вернуть на неполный номер
+    max_results: int = 20
 
     def _run(self, query: str) -> str:
-        print(f"[DEBUG] Tool '{self.name}' called with input: {query}")
+        log.debug("Tool '%s' called with input: %s", self.name, query)
         if len(query.split()) < 1:
-            print("ОШИБКА!!! Пустая строка")
+            log.warning("Tool '%s': пустая строка запроса", self.name)
             return ""
+        # Точный номер ищем по индексу, неполный (например 'TCH-250211') — по префиксу
         try:
-            with open(self.json_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            orders = self.order_backend.find(query, limit=self.max_results)
+            annotate(catalog_size=self.order_backend.size(), matches=len(orders))
         except Exception as e:
-            result = f"Ошибка при чтении JSON: {e}"
-            print(f"[DEBUG] Tool '{self.name}' output: {result}")
+            result = f"Ошибка при чтении заказов: {e}"
+            log.debug("Tool '%s' output: %s", self.name, result)
             return result
 
-        query_lower = query.strip().lower()
         results = []
-        for idx, item in enumerate(data, start=1):
+        for idx, item in orders:
             order_number = item.get('Номер заказа', '')
             order_items = item.get('Состав заказа', '')
             order_date = item.get('Дата формирования заказа', '')
             delivery_status = item.get('Статус доставки', '')
             delivery_date = item.get('Дата доставки', '')
 
-            if query_lower in order_number.lower():
-                snippet = (
-                    f"Номер заказа: {order_number}\n"
-                    f"Состав заказа: {order_items}\n"
-                    f"Дата формирования заказа: {order_date}\n"
-                    f"Статус доставки: {delivery_status}\n"
-                    f"Дата доставки: {delivery_date}"
-                )
-                results.append(f"[doc {idx}] {snippet}")
+            snippet = (
+                f"Номер заказа: {order_number}\n"
+                f"Состав заказа: {order_items}\n"
+                f"Дата формирования заказа: {order_date}\n"
+                f"Статус доставки: {delivery_status}\n"
+                f"Дата доставки: {delivery_date}"
+            )
+            results.append(f"[doc {idx}] {snippet}")
 
         if not results:
             result = ""
         else:
             result = "\n".join(results)
 
-        print(f"[DEBUG] Tool '{self.name}' output: {result}")
+        log.debug("Tool '%s' output: %s", self.name, result)
         return result
 
     async def _arun(self, query: str) -> str:
-        raise NotImplementedError("Async not implemented")
+        # Хранилище заказов может ходить в SQLite — уводим блокирующий вызов в поток
+        return await asyncio.to_thread(self._run, query)
 
 
 class JSONSimilarProductsTool(BaseTool):
     """
-    Инструмент, который загружает JSON и ищет товар по 'Название товара',
+    Инструмент, который берёт JSON из общего хранилища каталогов и ищет товар по 'Название товара',
     чтобы вернуть 'Похожие товары'.
     """
     name: str = "json_similar_products_search"
@@ -160,90 +183,156 @@ class JSONSimilarProductsTool(BaseTool):
     json_path: str
 
     def _run(self, query: str) -> str:
-        print(f"[DEBUG] Tool '{self.name}' called with input: {query}")
+        log.debug("Tool '%s' called with input: %s", self.name, query)
         if len(query.split()) < 1:
-            print("ОШИБКА!!! Пустая строка")
+            log.warning("Tool '%s': пустая строка запроса", self.name)
             return ""
         try:
-            with open(self.json_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            catalog = catalog_store.get(self.json_path)
+            positions, fuzzy = search_by_name(catalog, query.strip(), 'Название товара')
+            annotate(catalog_size=len(catalog), matches=len(positions), fuzzy=fuzzy)
         except Exception as e:
             result = f"Ошибка при чтении JSON: {e}"
-            print(f"[DEBUG] Tool '{self.name}' output: {result}")
+            log.debug("Tool '%s' output: %s", self.name, result)
             return result
 
-        query_lower = query.strip().lower()
-        results = []
-        for idx, item in enumerate(data, start=1):
+        results = [FUZZY_RESULTS_HEADER] if fuzzy and positions else []
+        for pos in positions:
+            item = catalog.records[pos]
             prod_name = item.get('Название товара', '')
             similar = item.get('Похожие товары', [])
 
-            if query_lower in prod_name.lower():
-                similar_str = ", ".join(similar)
-                snippet = (
-                    f"Название товара: {prod_name}\n"
-                    f"Похожие товары: {similar_str}"
-                )
-                results.append(f"[doc {idx}] {snippet}")
+            # В similar_products.json список хранится строкой через запятую
+            similar_str = similar if isinstance(similar, str) else ", ".join(similar)
+            snippet = (
+                f"Название товара: {prod_name}\n"
+                f"Похожие товары: {similar_str}"
+            )
+            results.append(f"[doc {pos + 1}] {snippet}")
 
         if not results:
             result = ""
         else:
             result = "\n".join(results)
 
-        print(f"[DEBUG] Tool '{self.name}' output: {result}")
+        log.debug("Tool '%s' output: %s", self.name, result)
         return result
 
     async def _arun(self, query: str) -> str:
-        raise NotImplementedError("Async not implemented")
+        # Поиск идёт по индексам в памяти и занимает микросекунды —
+        # выполняем прямо в event loop, без передачи в поток
+        return self._run(query)
 
 class JSONTasteSearchTool(BaseTool):
     """
-    Инструмент, который загружает JSON и ищет товары по ключу 'Вкус'.
+    Инструмент, который берёт JSON из общего хранилища каталогов и ищет товары по ключу 'Вкус'.
     Возвращает найденные записи (название товара и значение 'Вкус') в текстовом виде.
     """
     name: str = "json_taste_search"
     description: str = (
         "Быстрый поиск по вкусу товара в JSON. "
         "Используй, если пользователь хочет найти товар по конкретному вкусу. "
-        "Ожидается ввод в формате: '<Вкус>' (например, 'Черный'). "
+        "Ожидается ввод в формате: '<Вкус>' (например, 'Черный') "
+        "или несколько вкусов через запятую (например, 'Цитрусовый, Черный'). "
         "Возвращает 'Название товара' и 'Вкус' найденных товаров."
     )
     json_path: str
 
     def _run(self, query: str) -> str:
-        print(f"[DEBUG] Tool '{self.name}' called with input: {query}")
+        log.debug("Tool '%s' called with input: %s", self.name, query)
 
         taste_query = query.strip().lower()
         if not taste_query:
             return "Ошибка: пустой запрос. Пожалуйста, укажите вкус для поиска."
 
         try:
-            with open(self.json_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            catalog = catalog_store.get(self.json_path)
+            taste_index = catalog.index("taste", TasteIndex)
         except Exception as e:
             result = f"Ошибка при чтении JSON: {e}"
-            print(f"[DEBUG] Tool '{self.name}' output: {result}")
+            log.debug("Tool '%s' output: %s", self.name, result)
             return result
 
+        # Можно передать несколько вкусов через запятую: товары с большим числом совпадений идут первыми
+        taste_count = len(set(split_tastes(taste_query)))
+        hits = taste_index.search(taste_query)
+        annotate(catalog_size=len(catalog), matches=len(hits))
         results = []
-        for idx, item in enumerate(data, start=1):
+        for pos, matched in hits:
+            item = catalog.records[pos]
             taste = item.get("Вкус")
-            if taste and taste_query in taste.lower():
-                name = item.get("Название", "Неизвестное название")
-                snippet = f"Название товара: {name}\nВкус: {taste}"
-                results.append(f"[doc {idx}] {snippet}")
+            name = item.get("Название", "Неизвестное название")
+            snippet = f"Название товара: {name}\nВкус: {taste}"
+            if taste_count > 1:
+                snippet += f"\nСовпало вкусов: {matched} из {taste_count}"
+            results.append(f"[doc {pos + 1}] {snippet}")
+
+        if not results:
+            result = "Нет товаров с указанным вкусом."
+        else:
+            result = "\n".join(results)
+
+        log.debug("Tool '%s' output: %s", self.name, result)
+        return result
+
+    async def _arun(self, query: str) -> str:
+        # Поиск идёт по индексам в памяти и занимает микросекунды —
+        # выполняем прямо в event loop, без передачи в поток
+        return self._run(query)
+
+class JSONSemanticTasteTool(BaseTool):
+    """
+    Инструмент рекомендаций по свободному описанию вкуса: ищет ближайшие товары
+    в FAISS-индексе эмбеддингов 'Описание' + 'Вкус' (см. product_index.py).
+    Возвращает top_k товаров (название и значение 'Вкус') в текстовом виде.
+    """
+    name: str = "semantic_taste_search"
+    description: str = (
+        "Рекомендация товаров по описанию вкуса своими словами. "
+        "Используй, если пользователь просит что-то посоветовать по вкусу или настроению "
+        "(например, 'что-нибудь бодрящее с цитрусом' или 'мягкий чай на вечер'). "
+        "Ожидается ввод: пожелание пользователя как есть. "
+        "Возвращает 'Название товара' и 'Вкус' самых подходящих товаров."
+    )
+    json_path: str
+    product_index: Any
+    top_k: int = DEFAULT_TOP_K
+
+    def _run(self, query: str) -> str:
+        log.debug("Tool '%s' called with input: %s", self.name, query)
+
+        taste_query = query.strip().strip('"').strip()
+        if not taste_query:
+            return "Ошибка: пустой запрос. Пожалуйста, опишите желаемый вкус."
+
+        try:
+            catalog = catalog_store.get(self.json_path)
+            # Индекс сверяется с каталогом один раз на загрузку файла: перекодируются только изменённые товары
+            search = catalog.index("semantic", self.product_index.sync)
+        except Exception as e:
+            result = f"Ошибка при чтении JSON: {e}"
+            log.debug("Tool '%s' output: %s", self.name, result)
+            return result
+
+        hits = search.search(taste_query, self.top_k)
+        annotate(catalog_size=len(catalog), matches=len(hits))
+        results = []
+        for pos, _ in hits:
+            item = catalog.records[pos]
+            name = item.get("Название", "Неизвестное название")
+            results.append(f"[doc {pos + 1}] Название товара: {name}\nВкус: {item.get('Вкус') or 'не указан'}")
 
         if not results:
             result = "Нет товаров с указанным вкусом."
         else:
             result = "\n".join(results)
 
-        print(f"[DEBUG] Tool '{self.name}' output: {result}")
+        log.debug("Tool '%s' output: %s", self.name, result)
         return result
 
     async def _arun(self, query: str) -> str:
-        raise NotImplementedError("Async not implemented")
+        # Запрос кодируется моделью эмбеддингов (а при изменении каталога ещё и товары) — уводим в поток
+        return await asyncio.to_thread(self._run, query)
 
 # ====================== КАСТОМНЫЙ OUTPUT PARSER ======================
 
@@ -255,8 +344,18 @@ class CustomOutputParser(AgentOutputParser):
       - Если находит шаблон для действия (Action + Action Input на отдельных строках),
         возвращает AgentAction
       - Иначе возвращает AgentFinish с полным текстом.
+    Для потоковых ответов stream_detector() ищет тот же маркер "Final Answer:"
+    в тексте, приходящем по токенам (см. streaming.py).
     """
+    def stream_detector(self) -> FinalAnswerStreamDetector:
+        return FinalAnswerStreamDetector(FINAL_ANSWER_MARKER)
+
     def parse(self, llm_output: str) -> Union[AgentAction, AgentFinish]:
+        # Время разбора попадает в спан "parser" текущего запроса (см. telemetry.py)
+        with span("parser", "parser"):
+            return self._parse(llm_output)
+
+    def _parse(self, llm_output: str) -> Union[AgentAction, AgentFinish]:
         # Удаляем строки, начинающиеся с "Thought:"
         cleaned_lines = [
             line for line in llm_output.splitlines() 
@@ -265,8 +364,8 @@ class CustomOutputParser(AgentOutputParser):
         cleaned_output = "\n".join(cleaned_lines).strip()
         
         # Если найден блок Final Answer, возвращаем финальный ответ
-        if "Final Answer:" in cleaned_output:
-            final_answer = cleaned_output.split("Final Answer:")[-1].strip()
+        if FINAL_ANSWER_MARKER in cleaned_output:
+            final_answer = cleaned_output.split(FINAL_ANSWER_MARKER)[-1].strip()
             return AgentFinish(return_values={"output": final_answer}, log=cleaned_output)
         
         # Ожидаем, что действие записано в виде двух строк:
@@ -294,61 +393,84 @@ class LangChainQueryProcessor:
     """
     Класс, инкапсулирующий логику чтения JSON, создания ReAct-агента и общения через него.
     """
-    def __init__(self, json_file_tea, json_file_orders, json_file_similar):
+    def __init__(self, json_file_tea, json_file_orders, json_file_similar, orders_db_path=None,
+                 use_router=True, answer_cache=None, llm=None, product_index=None, conversation_log=None):
         # Установим заголовок для GigaChat (при необходимости)
         # headers = {
         #     "X-Session-ID": "8324244b-7133-4d30-a328-31d8466e5503",
         # }
         # gigachat.context.session_id_cvar.set(headers.get("X-Session-ID"))
 
-        # Токен для GigaChat (пример, у вас может быть свой)
-        GIGACHAT_CREDENTIALS = (
-            "ZWExMmU1NmUtZjhhNS00M2UxLWJlOGEtNGNhMjIwZWU2Zjc3OmIxMDIyNjZhLThjNmItNDM2NS1hNmI0LTY2ZTkyNTRiZGI1Yw=="
-        )
-
-        # Создаём саму модель GigaChat
-        self.model = GigaChat(
-            credentials=GIGACHAT_CREDENTIALS,
-            scope="GIGACHAT_API_PERS",
-            model="GigaChat-2-Max",
-            verify_ssl_certs=False,
-        )
+        # Модель GigaChat из общей фабрики процесса: пул соединений и токен, обновляемый в фоне.
+        # llm — замена модели (например, ReplayChatModel из replay_llm.py для прогонов без сети),
+        # product_index — замена FAISS-индекса товаров (например, с другим encoder'ом или без записи на диск)
+        self.model = llm if llm is not None else get_chat_model("GigaChat-2-Max")
 
-        # Инициализируем четыре инструмента
+        # Инициализируем пять инструментов
         self.json_name_search_tool = JSONNameSearchTool(json_path=json_file_tea)
-        self.json_order_search_tool = JSONOrderSearchTool(json_path=json_file_orders)
+        # Заказы: SQLite, если указана база (см. order_store.py), иначе orders.json
+        if orders_db_path:
+            order_backend = SQLiteOrderBackend(orders_db_path)
+        else:
+            order_backend = JSONOrderBackend(json_file_orders)
+        self.json_order_search_tool = JSONOrderSearchTool(order_backend=order_backend)
         self.json_similar_products_tool = JSONSimilarProductsTool(json_path=json_file_similar)
         self.json_taste_search_tool = JSONTasteSearchTool(json_path=json_file_tea)
+        # Рекомендации по свободному описанию вкуса: FAISS-индекс хранится в .product_index/ рядом с каталогом
+        self.semantic_taste_tool = JSONSemanticTasteTool(
+            json_path=json_file_tea,
+            product_index=product_index or ProductEmbeddingIndex.for_catalog(json_file_tea),
+        )
+
+        # Быстрый путь: шаблонные вопросы отвечаются по индексам без агента и GigaChat
+        self.router = IntentRouter(json_file_tea, order_backend, json_file_similar) if use_router else None
+
+        # Кеш ответов агента (см. answer_cache.py); по умолчанию только точное совпадение вопроса
+        if answer_cache is None:
+            answer_cache = AnswerCache(
+                watch_paths=[json_file_tea, orders_db_path or json_file_orders, json_file_similar]
+            )
+        self.answer_cache = answer_cache
+
+        # Журнал разговоров (ConversationLogger из conversation_log.py); None — не пишем
+        self.conversation_log = conversation_log
 
         # Собираем их в список Tools
         self.tools = [
             Tool(
                 name=self.json_name_search_tool.name,
                 func=self.json_name_search_tool.run,
+                coroutine=self.json_name_search_tool.arun,
                 description=self.json_name_search_tool.description
             ),
             Tool(
                 name=self.json_order_search_tool.name,
                 func=self.json_order_search_tool.run,
+                coroutine=self.json_order_search_tool.arun,
                 description=self.json_order_search_tool.description
             ),
             Tool(
                 name=self.json_similar_products_tool.name,
                 func=self.json_similar_products_tool.run,
+                coroutine=self.json_similar_products_tool.arun,
                 description=self.json_similar_products_tool.description
             ),
             Tool(
                 name=self.json_taste_search_tool.name,
                 func=self.json_taste_search_tool.run,
+                coroutine=self.json_taste_search_tool.arun,
                 description=self.json_taste_search_tool.description
             ),
+            Tool(
+                name=self.semantic_taste_tool.name,
+                func=self.semantic_taste_tool.run,
+                coroutine=self.semantic_taste_tool.arun,
+                description=self.semantic_taste_tool.description
+            ),
         ]
 
-        # Память
-        self.memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True
-        )
+        # Память: отдельное окно последних ходов для каждой сессии (см. session_memory.py)
+        self.sessions = SessionMemoryStore()
 
         # PromptTemplate
         self.custom_prompt = PromptTemplate(
@@ -357,47 +479,153 @@ class LangChainQueryProcessor:
         )
 
         # Создаём ReAct-агента
+        self.output_parser = CustomOutputParser()
         self.agent = create_react_agent(
             llm=self.model,
             tools=self.tools,
             prompt=self.custom_prompt,
-            output_parser=CustomOutputParser()
+            output_parser=self.output_parser
         )
 
-        # Оборачиваем агента в Executor
-        self.agent_executor = AgentExecutor.from_agent_and_tools(
+    def _new_executor(self) -> AgentExecutor:
+        """
+        Executor создаётся на каждый запрос: агент, модель и инструменты общие
+        (они не хранят состояние запроса), а промежуточные шаги ReAct-цикла
+        у каждого запроса свои. Создание executor'а ничего не загружает и обходится дёшево.
+        """
+        return AgentExecutor.from_agent_and_tools(
             agent=self.agent,
             tools=self.tools,
-            memory=self.memory,
-            verbose=True,
+            # Подробный вывод ReAct-цикла только при BOT_LOG_LEVEL=DEBUG
+            verbose=log.isEnabledFor(logging.DEBUG),
             handle_parsing_errors=True,
             max_iterations=20
-        ) 
+        )
 
-    def process_query_with_agent(self, user_input: str) -> str:
-        """Вызываем нашего агента (с учётом истории в памяти)."""
-        result = self.agent_executor({"input": user_input})
-        response = result["output"]
+    def process_query_with_agent(self, user_input: str, session_id: str = None, callbacks=None) -> str:
+        """
+        Вызываем нашего агента (с учётом истории в памяти сессии session_id).
+        Безопасно вызывать из нескольких потоков: запросы одной сессии идут по очереди,
+        разных сессий — параллельно. callbacks передаются агенту (например, для стриминга).
+        Тайминги запроса собираются в спаны и метрики (см. telemetry.py).
+        """
+        with request_trace(session_id=session_id or DEFAULT_SESSION_ID) as trace, \
+                self.sessions.session(session_id) as memory:
+            answer = self._fast_answer(user_input, memory)
+            if answer is None:
+                # История передаётся явно: executor не хранит состояние между запросами
+                chat_history = memory.load_memory_variables({})["chat_history"]
+                result = self._new_executor()(
+                    {"input": user_input, "chat_history": chat_history},
+                    callbacks=[TraceCallbackHandler(trace)] + list(callbacks or []),
+                )
+                answer = self._finish(user_input, result["output"], memory)
+            self._log_turn(user_input, answer, session_id, trace)
+            return answer
+
+    async def aprocess_query_with_agent(self, user_input: str, session_id: str = None, callbacks=None) -> str:
+        """
+        Асинхронная версия process_query_with_agent: пока GigaChat отвечает,
+        event loop обслуживает другие разговоры. Запросы одной сессии идут по очереди.
+        """
+        with request_trace(session_id=session_id or DEFAULT_SESSION_ID) as trace:
+            answer = await self._aprocess(user_input, session_id, [TraceCallbackHandler(trace)] + list(callbacks or []))
+            self._log_turn(user_input, answer, session_id, trace)
+            return answer
+
+    async def _aprocess(self, user_input: str, session_id: str, callbacks) -> str:
+        async with self.sessions.asession(session_id) as memory:
+            if self.answer_cache.semantic:
+                # Семантическому кешу нужна модель эмбеддингов — это CPU, уводим в поток
+                answer = await asyncio.to_thread(self._fast_answer, user_input, memory)
+            else:
+                answer = self._fast_answer(user_input, memory)
+            if answer is not None:
+                return answer
+
+            chat_history = memory.load_memory_variables({})["chat_history"]
+            result = await self._new_executor().ainvoke(
+                {"input": user_input, "chat_history": chat_history}, config={"callbacks": callbacks}
+            )
+            return self._finish(user_input, result["output"], memory)
+
+    def _fast_answer(self, user_input: str, memory):
+        """Ответ без агента: сначала правила (router.py), потом кеш ответов. None — нужен агент."""
+        if self.router is not None:
+            with span("router", "router"):
+                try:
+                    answer = self.router.route(user_input)
+                except Exception as e:
+                    log.warning("Router error, fallback to agent: %s", e)
+                    answer = None
+            if answer is not None:
+                log.debug("Router answered without agent: %s", answer)
+                set_route("router")
+                memory.save_context({"input": user_input}, {"output": answer})
+                return answer
+
+        # Кеш общий для всех сессий, а ответ на уточнение («Сколько он стоит?») зависит от истории —
+        # поэтому кеш используется только для первого вопроса сессии
+        if memory.chat_memory.messages:
+            return None
+        with span("answer_cache", "cache"):
+            answer = self.answer_cache.get(user_input)
+        if answer is not None:
+            log.debug("Answer cache hit: %s", answer)
+            set_route("cache")
+            memory.save_context({"input": user_input}, {"output": answer})
+            return answer
+        return None
+
+    def _log_turn(self, user_input: str, answer: str, session_id: str, trace) -> None:
+        """Ход разговора в журнал: запись уходит в очередь, диск пишет фоновый поток."""
+        if self.conversation_log is not None:
+            self.conversation_log.log(
+                user_input, answer, session_id=session_id or DEFAULT_SESSION_ID, route=trace.route
+            )
+
+    def _finish(self, user_input: str, response: str, memory) -> str:
+        """Сохраняем ответ агента в память сессии и в кеш."""
+        # В кеш — только ответы без истории (см. _fast_answer); заглушки и «Agent stopped»
+        # AnswerCache.put отбрасывает сам
+        first_turn = not memory.chat_memory.messages
+        memory.save_context({"input": user_input}, {"output": response})
+        if first_turn:
+            self.answer_cache.put(user_input, response)
         return response
 
 
-
 # ====================== ИНИЦИАЛИЗАЦИЯ НАШЕГО КЛАССА ======================
 
 # Пропишите пути к вашим файлам
 JSON_TEA_PATH = r"tea_data.json"            # Товары (название, описание, цена)
 JSON_ORDERS_PATH = r"orders.json"      # Заказы (номер заказа, статус, дата и т.д.)
 JSON_SIMILAR_PATH = r"similar_products.json" # Похожие товары
+ORDERS_DB_PATH = None                       # Например r"orders.db" (python backend/order_store.py); None — orders.json
+# Журнал разговоров /bot в JSON Lines, например conversation_log.jsonl (см. conversation_log.py); пусто — выключен
+CONVERSATION_LOG_PATH = os.environ.get("BOT_CONVERSATION_LOG")
 
 file_search = LangChainQueryProcessor(
     json_file_tea=JSON_TEA_PATH,
     json_file_orders=JSON_ORDERS_PATH,
-    json_file_similar=JSON_SIMILAR_PATH
+    json_file_similar=JSON_SIMILAR_PATH,
+    orders_db_path=ORDERS_DB_PATH,
+    # BOT_LLM_REPLAY / BOT_LLM_RECORD — проигрывание или запись ответов модели (см. replay_llm.py)
+    llm=llm_from_env(lambda: get_chat_model("GigaChat-2-Max")),
+    conversation_log=ConversationLogger(CONVERSATION_LOG_PATH) if CONVERSATION_LOG_PATH else None,
 )
 
 
 # ====================== FLASK-СЕРВИС ======================
 
+# Пул воркеров для агента: сервис упирается в ожидание GigaChat, а не в CPU,
+# поэтому потоков может быть заметно больше, чем ядер
+BOT_WORKERS = int(os.environ.get("BOT_WORKERS", "16"))
+BOT_TIMEOUT = float(os.environ.get("BOT_TIMEOUT", "120"))  # секунд на один ответ
+
+bot_pool = ThreadPoolExecutor(max_workers=BOT_WORKERS, thread_name_prefix="bot")
+
+
 @app.route('/bot', methods=['POST'])
 def bot():
     data = request.json
@@ -405,9 +633,68 @@ def bot():
     if not user_input:
         return jsonify({'response': 'Пожалуйста, отправьте текст!'}), 400
 
-    search_result = file_search.process_query_with_agent(user_input)
+    # Идентификатор сессии: из тела запроса или заголовка X-Session-ID
+    session_id = data.get('session_id') or request.headers.get('X-Session-ID')
+    future = bot_pool.submit(file_search.process_query_with_agent, user_input, session_id)
+    try:
+        search_result = future.result(timeout=BOT_TIMEOUT)
+    except FutureTimeoutError:
+        return jsonify({'response': 'Ответ занимает слишком много времени. Попробуйте ещё раз.'}), 504
     return jsonify({'response': search_result})
 
 
+@app.route('/bot/stream', methods=['POST'])
+def bot_stream():
+    """
+    Потоковая версия /bot (server-sent events). События:
+      start — сразу после приёма запроса; tool_start / tool_end — работа инструментов;
+      token — очередной кусок финального ответа; done — весь ответ целиком; error — ошибка.
+    """
+    data = request.json
+    user_input = data.get('message', '').strip()
+    if not user_input:
+        return jsonify({'response': 'Пожалуйста, отправьте текст!'}), 400
+    session_id = data.get('session_id') or request.headers.get('X-Session-ID')
+
+    events = queue.Queue()
+    handler = StreamingEventHandler(events.put, detector_factory=file_search.output_parser.stream_detector)
+
+    def run_agent():
+        try:
+            answer = file_search.process_query_with_agent(user_input, session_id, callbacks=[handler])
+            events.put({"event": "done", "response": answer})
+        except Exception as e:
+            events.put({"event": "error", "message": str(e)})
+        finally:
+            events.put(None)
+
+    bot_pool.submit(run_agent)
+
+    def generate():
+        yield format_sse({"event": "start"})
+        while True:
+            try:
+                event = events.get(timeout=BOT_TIMEOUT)
+            except queue.Empty:
+                yield format_sse({"event": "error", "message": "timeout"})
+                return
+            if event is None:
+                return
+            yield format_sse(event)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Метрики в формате Prometheus: задержки запросов, LLM, инструментов, парсера, токены."""
+    return Response(registry.render(), mimetype=None, content_type=METRICS_CONTENT_TYPE)
+
+
 if __name__ == '__main__':
-    app.run(debug=True)
+    # threaded=True: каждый HTTP-запрос в своём потоке, агент — в пуле bot_pool
+    app.run(debug=True, threaded=True)
@@ -0,0 +1,149 @@
+import json
+import asyncio
+
+# Тот же процессор, что и у Flask-сервиса (индексы, роутер, кеш, сессии)
+from app import file_search, BOT_TIMEOUT
+from gigachat_client import gigachat_factory
+from streaming import StreamingEventHandler, format_sse
+from telemetry import METRICS_CONTENT_TYPE, log, registry
+
+# ====================== ASGI-СЕРВИС ======================
+#
+# Асинхронный /bot: один процесс держит сотни разговоров, ожидающих GigaChat,
+# не занимая на каждый по потоку. Запуск из корня проекта любым ASGI-сервером, например:
+#   uvicorn --app-dir backend asgi:app --port 5000
+# Формат запроса и ответа тот же, что у Flask-версии в app.py (/bot, потоковый /bot/stream и /metrics).
+
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-allow-methods", b"POST, OPTIONS"),
+    (b"access-control-allow-headers", b"content-type, x-session-id"),
+]
+
+
+async def _send_json(send, status: int, payload: dict):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json; charset=utf-8")] + CORS_HEADERS,
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # Токен и соединения асинхронного пула готовим до первого запроса
+            try:
+                await gigachat_factory.awarm_up()
+            except Exception as e:
+                log.warning("GigaChat: прогрев не удался: %s", e)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    method = scope["method"]
+    if method == "OPTIONS":
+        await send({"type": "http.response.start", "status": 204, "headers": CORS_HEADERS})
+        await send({"type": "http.response.body", "body": b""})
+        return
+    if scope["path"] == "/metrics" and method == "GET":
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", METRICS_CONTENT_TYPE.encode("latin-1"))] + CORS_HEADERS,
+        })
+        await send({"type": "http.response.body", "body": registry.render().encode("utf-8")})
+        return
+    if scope["path"] not in ("/bot", "/bot/stream") or method != "POST":
+        await _send_json(send, 404, {"response": "Not found"})
+        return
+
+    try:
+        data = json.loads(await _read_body(receive) or b"{}")
+    except ValueError:
+        data = {}
+    user_input = (data.get("message") or "").strip() if isinstance(data, dict) else ""
+    if not user_input:
+        await _send_json(send, 400, {"response": "Пожалуйста, отправьте текст!"})
+        return
+
+    # Идентификатор сессии: из тела запроса или заголовка X-Session-ID
+    headers = dict(scope.get("headers") or [])
+    session_id = data.get("session_id") or headers.get(b"x-session-id", b"").decode("latin-1") or None
+
+    if scope["path"] == "/bot/stream":
+        await _bot_stream(send, user_input, session_id)
+        return
+
+    try:
+        search_result = await asyncio.wait_for(
+            file_search.aprocess_query_with_agent(user_input, session_id),
+            timeout=BOT_TIMEOUT,
+        )
+    except asyncio.TimeoutError:
+        await _send_json(send, 504, {"response": "Ответ занимает слишком много времени. Попробуйте ещё раз."})
+        return
+    await _send_json(send, 200, {"response": search_result})
+
+
+async def _bot_stream(send, user_input: str, session_id):
+    """Server-sent events: start, tool_start / tool_end, token, done или error (см. /bot/stream в app.py)."""
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+        ] + CORS_HEADERS,
+    })
+
+    async def send_event(event: dict):
+        await send({"type": "http.response.body", "body": format_sse(event).encode("utf-8"), "more_body": True})
+
+    await send_event({"event": "start"})
+
+    events = asyncio.Queue()
+    handler = StreamingEventHandler(events.put_nowait, detector_factory=file_search.output_parser.stream_detector)
+    task = asyncio.ensure_future(asyncio.wait_for(
+        file_search.aprocess_query_with_agent(user_input, session_id, callbacks=[handler]),
+        timeout=BOT_TIMEOUT,
+    ))
+
+    # Пересылаем события, пока агент работает, затем остаток очереди
+    while not task.done() or not events.empty():
+        getter = asyncio.ensure_future(events.get())
+        await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+        if getter.done():
+            await send_event(getter.result())
+        else:
+            getter.cancel()
+
+    try:
+        await send_event({"event": "done", "response": task.result()})
+    except asyncio.TimeoutError:
+        await send_event({"event": "error", "message": "timeout"})
+    except Exception as e:
+        await send_event({"event": "error", "message": str(e)})
+    await send({"type": "http.response.body", "body": b""})
@@ -0,0 +1,155 @@
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+# ====================== ОГРАНИЧЕНИЕ ЧАСТОТЫ ======================
+
+class RateLimiter:
+    """
+    Не больше rate запусков в секунду на все потоки (равномерно, без всплесков):
+    GigaChat отвечает 429, если разом отправить весь набор вопросов.
+    """
+    def __init__(self, rate: Optional[float]):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+# ====================== ЧЕКПОИНТ ======================
+
+class Checkpoint:
+    """
+    Готовые ответы дописываются в JSONL-файл по одному на строку сразу после получения.
+    Прерванный прогон при следующем запуске пропускает вопросы, ответы на которые уже есть.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def load(self) -> Dict[int, Dict[str, str]]:
+        done: Dict[int, Dict[str, str]] = {}
+        if not os.path.exists(self.path):
+            return done
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Последняя строка могла не дописаться при аварийной остановке
+                    continue
+                done[record["index"]] = record
+        return done
+
+    def append(self, index: int, question: str, answer: str) -> None:
+        line = json.dumps({"index": index, "Вопрос": question, "Ответ модели": answer}, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def remove(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# ====================== ПАКЕТНЫЙ ПРОГОН ======================
+
+def load_questions(path: str) -> List[str]:
+    """Вопросы из файла вида [{"Вопрос": ..., "Эталонный ответ": ...}, ...]."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return [entry.get("Вопрос", "").strip() for entry in data if entry.get("Вопрос", "").strip()]
+
+
+def run_batch(
+    questions: List[str],
+    answer_fn: Callable[[str], str],
+    output_path: str,
+    checkpoint_path: Optional[str] = None,
+    workers: int = 4,
+    retries: int = 3,
+    backoff: float = 2.0,
+    rate: Optional[float] = None,
+) -> List[Dict[str, str]]:
+    """
+    Прогоняет вопросы через answer_fn в workers потоков и пишет output_path
+    в формате [{"Вопрос": ..., "Ответ модели": ...}] в порядке исходного файла.
+      - answer_fn должна сама создавать для вопроса отдельного агента и память;
+      - при ошибке вопрос повторяется до retries раз с экспоненциальной паузой (backoff, 2*backoff, ...);
+      - rate — не больше стольких новых вопросов в секунду;
+      - ответы сразу пишутся в чекпоинт (по умолчанию <output_path>.partial.jsonl),
+        после успешного прогона чекпоинт удаляется.
+    Вопросы, которые так и не удалось обработать, в результат не попадают:
+    повторный запуск с теми же параметрами доделает только их.
+    """
+    checkpoint = Checkpoint(checkpoint_path or output_path + ".partial.jsonl")
+    done = {
+        index: record for index, record in checkpoint.load().items()
+        if index < len(questions) and record.get("Вопрос") == questions[index]
+    }
+    pending = [index for index in range(len(questions)) if index not in done]
+    print(f"Вопросов: {len(questions)}, уже готово: {len(done)}, осталось: {len(pending)}")
+
+    limiter = RateLimiter(rate)
+    failed: Dict[int, str] = {}
+
+    def solve(index: int) -> str:
+        question = questions[index]
+        for attempt in range(retries + 1):
+            limiter.acquire()
+            try:
+                return answer_fn(question)
+            except Exception as e:
+                if attempt == retries:
+                    raise
+                delay = backoff * (2 ** attempt) * (1 + random.random() * 0.25)
+                print(f"[{index + 1}] Ошибка: {e}; повтор через {delay:.1f} с")
+                time.sleep(delay)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="eval") as pool:
+        # Каждая задача получает копию контекста (например, gigachat.context.session_id_cvar)
+        futures = {
+            pool.submit(contextvars.copy_context().run, solve, index): index for index in pending
+        }
+        for completed, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            try:
+                answer = future.result()
+            except Exception as e:
+                failed[index] = str(e)
+                print(f"[{index + 1}] Не удалось получить ответ: {e}")
+                continue
+            checkpoint.append(index, questions[index], answer)
+            done[index] = {"Вопрос": questions[index], "Ответ модели": answer}
+            print(f"Готово {completed}/{len(pending)} ({time.perf_counter() - started:.1f} с)")
+
+    results = [
+        {"Вопрос": done[index]["Вопрос"], "Ответ модели": done[index]["Ответ модели"]}
+        for index in sorted(done)
+    ]
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if failed:
+        print(f"Без ответа осталось {len(failed)} вопросов — запустите снова, чтобы доделать их.")
+    else:
+        checkpoint.remove()
+    return results
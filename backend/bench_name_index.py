@@ -0,0 +1,79 @@
+import json
+import random
+import time
+
+from indexes import NameIndex
+
+# Сравнение старого линейного поиска json_name_search с индексом NameIndex.
+# Запуск из корня проекта: python backend/bench_name_index.py
+
+JSON_TEA_PATH = r"tea_data.json"
+SIZES = [56, 10_000, 100_000]
+REPEATS = 200
+
+# Запросы: точные названия, фрагменты названий и отсутствующий товар
+QUERIES = [
+    "Эрл Грей",
+    "Большой красный халат (Да Хун Пао)",
+    "Декаф",
+    "улун",
+    "Бразилия",
+    "Пуэр",
+]
+
+
+SYLLABLES = ["ка", "ро", "ми", "ту", "ле", "на", "со", "ви", "за", "пе", "гу", "ды", "шо", "жа", "хи", "фе"]
+
+
+def make_catalog(base, size):
+    """
+    Синтетический каталог заданного размера: реальные товары из tea_data.json
+    плюс случайные названия из слогов, чтобы число совпадений не росло с размером.
+    """
+    if size <= len(base):
+        return base[:size]
+    rng = random.Random(size)
+    data = list(base)
+    while len(data) < size:
+        item = dict(rng.choice(base))
+        words = ["".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(rng.randint(1, 3))]
+        item["Название"] = " ".join(words).capitalize()
+        data.append(item)
+    return data
+
+
+def linear_scan(data, raw_name):
+    """Поиск в том виде, в каком он был в JSONNameSearchTool._run до индекса."""
+    name_lower = raw_name.lower()
+    return [
+        idx for idx, item in enumerate(data)
+        if name_lower in item.get("Название", "").lower()
+    ]
+
+
+def timeit(func, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats * 1e6  # мкс на вызов
+
+
+if __name__ == "__main__":
+    with open(JSON_TEA_PATH, "r", encoding="utf-8") as f:
+        base = json.load(f)
+
+    print(f"{'Товаров':>8} | {'Построение, мс':>14} | {'Скан, мкс':>10} | {'Индекс, мкс':>11} | {'Ускорение':>9} | {'Совпадений':>10}")
+    for size in SIZES:
+        data = make_catalog(base, size)
+
+        start = time.perf_counter()
+        index = NameIndex(data)
+        build_ms = (time.perf_counter() - start) * 1e3
+
+        repeats = max(3, REPEATS * 56 // size)
+        scan_us = sum(timeit(lambda q=q: linear_scan(data, q), repeats) for q in QUERIES) / len(QUERIES)
+        index_us = sum(timeit(lambda q=q: index.search(q), REPEATS) for q in QUERIES) / len(QUERIES)
+
+        matches = sum(len(index.search(q)) for q in QUERIES) / len(QUERIES)
+
+        print(f"{size:>8} | {build_ms:>14.1f} | {scan_us:>10.1f} | {index_us:>11.1f} | {scan_us / index_us:>8.1f}x | {matches:>10.1f}")
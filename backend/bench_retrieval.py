@@ -0,0 +1,110 @@
+import argparse
+import json
+import time
+from typing import Any, Dict, List, Sequence
+
+from bench_suite import run_metadata, summarize
+from document_index import DocumentIndex
+from hybrid_retrieval import CrossEncoderReranker, HybridRetriever, tokenize
+
+# Офлайн-сравнение поиска по документам parser.py: recall@k и задержка для
+# плотного поиска (FAISS), BM25, гибрида (RRF) и гибрида с cross-encoder.
+# GigaChat не нужен: оцениваются только найденные чанки.
+# Запуск из корня проекта:
+#   python backend/bench_retrieval.py
+#   python backend/bench_retrieval.py --rerank --k 1 3 5 10 --output retrieval_bench.json
+#
+# Релевантный чанк — тот, что содержит эталонный ответ из evaluation_dataset.json:
+# все числа ответа и не меньше COVERAGE_THRESHOLD его слов. Вопросы, для которых
+# в документах нет ни одного такого чанка, в recall не учитываются.
+
+DATASET_PATH = "evaluation_dataset.json"
+SOURCES = ["pars.pdf", "pars.docx"]
+K_VALUES = [1, 3, 5, 10]
+COVERAGE_THRESHOLD = 0.6
+
+
+def is_relevant(answer: str, text: str) -> bool:
+    answer_tokens = set(tokenize(answer))
+    if not answer_tokens:
+        return False
+    text_tokens = set(tokenize(text))
+    if any(token.isdigit() and token not in text_tokens for token in answer_tokens):
+        return False
+    return len(answer_tokens & text_tokens) / len(answer_tokens) >= COVERAGE_THRESHOLD
+
+
+def label(dataset: Sequence[Dict[str, str]], retriever: HybridRetriever) -> List[Dict[str, Any]]:
+    """Вопросы с множеством релевантных чанков (номера в retriever.docs)."""
+    labeled = []
+    for item in dataset:
+        relevant = {
+            pos for pos, doc in enumerate(retriever.docs) if is_relevant(item["answer"], doc.page_content)
+        }
+        if relevant:
+            labeled.append({"question": item["question"], "relevant": relevant})
+    return labeled
+
+
+def evaluate_mode(name: str, retriever: HybridRetriever, labeled: List[Dict[str, Any]],
+                  k_values: Sequence[int]) -> Dict[str, Any]:
+    positions = {id(doc): pos for pos, doc in enumerate(retriever.docs)}
+    max_k = max(k_values)
+
+    # Задержка одного вопроса (как в интерактивном parser.py) ...
+    samples = []
+    rankings = []
+    for item in labeled:
+        start = time.perf_counter()
+        docs = retriever.retrieve(item["question"], max_k)
+        samples.append(time.perf_counter() - start)
+        rankings.append([positions[id(doc)] for doc in docs])
+
+    # ... и всего набора одним пакетом (process_questions_from_json)
+    start = time.perf_counter()
+    retriever.retrieve_batch([item["question"] for item in labeled], max_k)
+    batch_seconds = time.perf_counter() - start
+
+    record = {"mode": name, "questions": len(labeled), "batch_ms": round(batch_seconds * 1e3, 3), **summarize(samples)}
+    for k in k_values:
+        hits = sum(1 for item, ranking in zip(labeled, rankings) if item["relevant"] & set(ranking[:k]))
+        record[f"recall@{k}"] = round(hits / len(labeled), 4)
+    return record
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="recall@k и задержка поиска по документам")
+    parser.add_argument("--sources", nargs="+", default=SOURCES, help="файлы и/или каталоги PDF/DOCX")
+    parser.add_argument("--dataset", default=DATASET_PATH)
+    parser.add_argument("--k", nargs="+", type=int, default=K_VALUES)
+    parser.add_argument("--rerank", action="store_true", help="добавить гибрид с cross-encoder")
+    parser.add_argument("--output", default=None, help="сохранить результаты в JSON")
+    args = parser.parse_args()
+
+    with open(args.dataset, "r", encoding="utf-8") as f:
+        dataset = [item for item in json.load(f) if item.get("question") and item.get("answer")]
+
+    vectorstore = DocumentIndex().sync(args.sources)
+    modes = {mode: HybridRetriever(vectorstore, mode=mode) for mode in HybridRetriever.MODES}
+    if args.rerank:
+        modes["hybrid+rerank"] = HybridRetriever(vectorstore, reranker=CrossEncoderReranker())
+
+    labeled = label(dataset, modes["hybrid"])
+    print(f"Чанков: {len(modes['hybrid'].docs)}; вопросов: {len(dataset)}, с ответом в документах: {len(labeled)}")
+    if not labeled:
+        raise SystemExit("Нет вопросов, ответ на которые есть в документах")
+
+    results = []
+    for name, retriever in modes.items():
+        # Прогрев: загрузка моделей не должна попадать в замеры
+        retriever.retrieve(labeled[0]["question"], max(args.k))
+        record = evaluate_mode(name, retriever, labeled, args.k)
+        results.append(record)
+        recalls = "  ".join(f"R@{k} {record[f'recall@{k}']:.3f}" for k in args.k)
+        print(f"{name:<14} {recalls}  p50 {record['p50_us'] / 1e3:7.2f} мс  "
+              f"p95 {record['p95_us'] / 1e3:7.2f} мс  пакет {record['batch_ms']:8.1f} мс")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"meta": run_metadata(), "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены в {args.output}")
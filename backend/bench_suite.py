@@ -0,0 +1,341 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from bench_name_index import SYLLABLES
+
+# Набор замеров: инструменты на синтетических каталогах, парсер, сборка промпта и /bot под нагрузкой.
+# Запуск из корня проекта (app.py читает backend\instruction.txt относительно него):
+#   python backend/bench_suite.py                         — все замеры, результат в bench_results.json
+#   python backend/bench_suite.py --suites tools --sizes 100 10000
+# Результат — JSON со списком замеров: его можно сравнивать между версиями.
+
+JSON_TEA_PATH = r"tea_data.json"
+JSON_ORDERS_PATH = r"orders.json"
+JSON_SIMILAR_PATH = r"similar_products.json"
+
+SIZES = [100, 10_000, 1_000_000]
+SUITES = ["tools", "parser", "prompt", "e2e"]
+
+# Сколько раз вызывать каждую операцию
+TOOL_REPEATS = 200
+PARSER_REPEATS = 200
+PROMPT_REPEATS = 100
+
+# /bot: задержка ответа заглушки LLM и уровни параллельности
+E2E_LLM_LATENCY = 0.05
+E2E_CONCURRENCY = [1, 8, 32]
+E2E_REQUESTS = 200
+
+
+# ====================== СТАТИСТИКА ======================
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, round(q / 100 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def summarize(samples_s: List[float]) -> Dict[str, float]:
+    """Статистика по замерам в секундах -> микросекунды."""
+    values = sorted(samples_s)
+    return {
+        "n": len(values),
+        "mean_us": round(sum(values) / len(values) * 1e6, 3),
+        "p50_us": round(percentile(values, 50) * 1e6, 3),
+        "p95_us": round(percentile(values, 95) * 1e6, 3),
+        "p99_us": round(percentile(values, 99) * 1e6, 3),
+    }
+
+
+def measure(func: Callable[[], Any], repeats: int) -> Dict[str, float]:
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+# ====================== СИНТЕТИЧЕСКИЕ КАТАЛОГИ ======================
+
+def _synthetic_name(rng: random.Random) -> str:
+    words = ["".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(rng.randint(1, 3))]
+    return " ".join(words).capitalize()
+
+
+def make_tea(base: List[dict], size: int) -> List[dict]:
+    """Реальные товары плюс синтетические с короткими описаниями (иначе 10⁶ записей — это гигабайт JSON)."""
+    rng = random.Random(size)
+    data = list(base[:size])
+    while len(data) < size:
+        item = dict(rng.choice(base))
+        item["Название"] = _synthetic_name(rng)
+        item["Описание"] = item.get("Описание", "")[:80]
+        data.append(item)
+    return data
+
+
+def make_similar(base: List[dict], size: int) -> List[dict]:
+    rng = random.Random(size)
+    data = list(base[:size])
+    while len(data) < size:
+        data.append({
+            "Название товара": _synthetic_name(rng),
+            "Похожие товары": ", ".join(_synthetic_name(rng) for _ in range(3)),
+        })
+    return data
+
+
+def make_orders(base: List[dict], size: int) -> List[dict]:
+    """Уникальные номера TCH-YYMMDD-NN: по 100 заказов в день начиная с 2020 года."""
+    rng = random.Random(size)
+    data = list(base[:size])
+    day0 = datetime.date(2020, 1, 1)
+    i = 0
+    while len(data) < size:
+        day = day0 + datetime.timedelta(days=i // 100)
+        item = dict(rng.choice(base))
+        item["Номер заказа"] = f"TCH-{day:%y%m%d}-{i % 100:02d}"
+        item["Дата формирования заказа"] = day.isoformat()
+        data.append(item)
+        i += 1
+    return data
+
+
+def _write_json(directory: str, name: str, data: List[dict]) -> str:
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    return path
+
+
+# ====================== ЗАМЕРЫ ======================
+
+def bench_tools(sizes: List[int], results: List[dict]) -> None:
+    """_run каждого инструмента на каталогах заданных размеров: первый вызов (загрузка + индекс) и поиск."""
+    import app
+    from order_store import JSONOrderBackend
+
+    with open(JSON_TEA_PATH, "r", encoding="utf-8") as f:
+        tea = json.load(f)
+    with open(JSON_ORDERS_PATH, "r", encoding="utf-8") as f:
+        orders = json.load(f)
+    with open(JSON_SIMILAR_PATH, "r", encoding="utf-8") as f:
+        similar = json.load(f)
+
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            tea_path = _write_json(directory, f"tea_{size}.json", make_tea(tea, size))
+            orders_path = _write_json(directory, f"orders_{size}.json", make_orders(orders, size))
+            similar_path = _write_json(directory, f"similar_{size}.json", make_similar(similar, size))
+
+            cases = [
+                (app.JSONNameSearchTool(json_path=tea_path),
+                 ["Эрл Грей, Цена", "Декаф, Описание", "Бразилия, Цена", "Эрл Грэй, Цена", "Несуществующий, Цена"]),
+                (app.JSONOrderSearchTool(order_backend=JSONOrderBackend(orders_path)),
+                 ["TCH-250210-01", "TCH-250211", "TCH-200105-07", "TCH-999999-99"]),
+                (app.JSONSimilarProductsTool(json_path=similar_path),
+                 ["Иван чай листовой", "Каскара Коста-Рика", "Несуществующий"]),
+                (app.JSONTasteSearchTool(json_path=tea_path),
+                 ["черный", "цитрусовый, черный", "земляничный"]),
+            ]
+            for tool, queries in cases:
+                # Первый вызов: загрузка файла в хранилище каталогов и построение индекса
+                start = time.perf_counter()
+                tool._run(queries[0])
+                first_call_ms = (time.perf_counter() - start) * 1e3
+
+                repeats = max(20, TOOL_REPEATS // len(queries))
+                samples = []
+                for query in queries:
+                    for _ in range(repeats):
+                        start = time.perf_counter()
+                        tool._run(query)
+                        samples.append(time.perf_counter() - start)
+                record = {"suite": "tools", "name": tool.name, "size": size,
+                          "first_call_ms": round(first_call_ms, 3), **summarize(samples)}
+                results.append(record)
+                print(f"  {tool.name:<30} {size:>9} записей: первый вызов {first_call_ms:9.1f} мс, "
+                      f"p50 {record['p50_us']:9.1f} мкс, p99 {record['p99_us']:9.1f} мкс")
+
+
+def bench_parser(results: List[dict]) -> None:
+    """CustomOutputParser.parse на длинных ответах модели: действие, финальный ответ, текст без разметки."""
+    import app
+
+    parser = app.CustomOutputParser()
+    rng = random.Random(0)
+    for length in [1_000, 10_000, 100_000]:
+        body = " ".join(_synthetic_name(rng) for _ in range(length // 8))[:length]
+        thoughts = "\n".join(f"Thought: {body[i:i + 80]}" for i in range(0, len(body), 80))
+        outputs = {
+            "action": f"{thoughts}\nAction: json_name_search\nAction Input: {body}",
+            "final_answer": f"{thoughts}\nFinal Answer: {body}",
+            "plain_text": body,
+        }
+        for kind, text in outputs.items():
+            record = {"suite": "parser", "name": kind, "size": len(text),
+                      **measure(lambda t=text: parser.parse(t), PARSER_REPEATS)}
+            results.append(record)
+            print(f"  parse {kind:<13} {len(text):>8} символов: p50 {record['p50_us']:9.1f} мкс")
+
+
+def bench_prompt(results: List[dict]) -> None:
+    """Сборка промпта из instruction.txt с растущей историей диалога."""
+    import app
+    from langchain.tools.render import render_text_description
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    prompt = app.file_search.custom_prompt
+    tools = render_text_description(app.file_search.tools)
+    tool_names = ", ".join(tool.name for tool in app.file_search.tools)
+    for turns in [0, 5, 50, 500]:
+        history = []
+        for i in range(turns):
+            history.append(HumanMessage(content=f"Сколько стоит товар номер {i}?"))
+            history.append(AIMessage(content=f"Цена товара номер {i} — {100 + i} рублей."))
+
+        def build(history=history):
+            return prompt.format(
+                input="Сколько стоит Эрл Грей?",
+                chat_history=history,
+                tools=tools,
+                tool_names=tool_names,
+                agent_scratchpad="",
+            )
+
+        record = {"suite": "prompt", "name": "format", "size": turns,
+                  "prompt_chars": len(build()), **measure(build, PROMPT_REPEATS)}
+        results.append(record)
+        print(f"  история {turns:>4} ходов: промпт {record['prompt_chars']:>7} символов, p50 {record['p50_us']:9.1f} мкс")
+
+
+def _e2e_cassette(tea: List[dict], count: int):
+    """Сценарии ReAct для вопросов о цене: Action -> Observation -> Final Answer."""
+    from replay_llm import ReplayCassette
+
+    cassette = ReplayCassette()
+    questions = []
+    for i in range(count):
+        item = tea[i % len(tea)]
+        # Номер в вопросе делает вопросы разными, чтобы кеш ответов не влиял на замер
+        question = f"Сколько стоит {item['Название']}? (вопрос {i})"
+        cassette.add_trace([
+            f"Action: json_name_search\nAction Input: {item['Название']}, Цена",
+            f"Final Answer: Цена товара «{item['Название']}» — {item.get('Цена', '')} рублей.",
+        ], question=question)
+        questions.append(question)
+    return cassette, questions
+
+
+def bench_e2e(results: List[dict]) -> None:
+    """/bot целиком (Flask, пул воркеров, агент, инструменты) с заглушкой LLM вместо GigaChat."""
+    import app
+    from answer_cache import AnswerCache
+    from replay_llm import ReplayChatModel
+
+    with open(JSON_TEA_PATH, "r", encoding="utf-8") as f:
+        tea = json.load(f)
+
+    for concurrency in E2E_CONCURRENCY:
+        cassette, questions = _e2e_cassette(tea, E2E_REQUESTS)
+        app.file_search = app.LangChainQueryProcessor(
+            json_file_tea=JSON_TEA_PATH,
+            json_file_orders=JSON_ORDERS_PATH,
+            json_file_similar=JSON_SIMILAR_PATH,
+            # Роутер ответил бы на вопросы о цене сам — замеряем путь через агента
+            use_router=False,
+            answer_cache=AnswerCache(watch_paths=[], max_entries=0),
+            llm=ReplayChatModel(cassette=cassette, latency=E2E_LLM_LATENCY),
+        )
+        local = threading.local()
+
+        def call(i: int) -> float:
+            client = getattr(local, "client", None)
+            if client is None:
+                client = local.client = app.app.test_client()
+            # Половина запросов без session_id: анонимные клиенты тоже не должны ждать друг друга
+            payload = {"message": questions[i]}
+            if i % 2:
+                payload["session_id"] = f"bench-{i}"
+            start = time.perf_counter()
+            response = client.post("/bot", json=payload)
+            elapsed = time.perf_counter() - start
+            if response.status_code != 200:
+                raise RuntimeError(f"/bot вернул {response.status_code}")
+            return elapsed
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            samples = list(pool.map(call, range(E2E_REQUESTS)))
+        wall = time.perf_counter() - started
+
+        record = {"suite": "e2e", "name": "/bot", "size": concurrency,
+                  "llm_latency_ms": E2E_LLM_LATENCY * 1e3,
+                  "throughput_rps": round(E2E_REQUESTS / wall, 2), **summarize(samples)}
+        results.append(record)
+        print(f"  параллельно {concurrency:>3}: {record['throughput_rps']:8.1f} запр/с, "
+              f"p50 {record['p50_us'] / 1e3:7.1f} мс, p95 {record['p95_us'] / 1e3:7.1f} мс, "
+              f"p99 {record['p99_us'] / 1e3:7.1f} мс")
+
+
+# ====================== ЗАПУСК ======================
+
+def run_metadata() -> Dict[str, Any]:
+    """Когда, на каком коммите и на какой платформе сделан замер — для JSON-результатов бенчмарков."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Замеры производительности бота")
+    parser.add_argument("--suites", nargs="+", choices=SUITES, default=SUITES)
+    parser.add_argument("--sizes", nargs="+", type=int, default=SIZES, help="Размеры синтетических каталогов")
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    # Замеры не ходят в GigaChat: модель процессора в app.py — заглушка без сценариев
+    os.environ.setdefault("BOT_LOG_LEVEL", "WARNING")
+    if "BOT_LLM_REPLAY" not in os.environ:
+        empty = os.path.join(tempfile.mkdtemp(), "empty_cassette.json")
+        with open(empty, "w", encoding="utf-8") as f:
+            json.dump({}, f)
+        os.environ["BOT_LLM_REPLAY"] = empty
+
+    results: List[dict] = []
+    for suite in args.suites:
+        print(f"== {suite}")
+        if suite == "tools":
+            bench_tools(args.sizes, results)
+        elif suite == "parser":
+            bench_parser(results)
+        elif suite == "prompt":
+            bench_prompt(results)
+        elif suite == "e2e":
+            bench_e2e(results)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump({"meta": run_metadata(), "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"Результаты сохранены в {args.output}")
@@ -0,0 +1,86 @@
+import os
+import json
+import threading
+from typing import Any, Callable, Dict, List, Tuple
+
+
+def file_version(path: str) -> Tuple[int, int]:
+    """Версия файла для проверки изменений: (mtime в наносекундах, размер в байтах)."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+# ====================== КАТАЛОГ (СНИМОК ОДНОГО JSON-ФАЙЛА) ======================
+
+class Catalog:
+    """
+    Снимок одного JSON-файла: уже разобранные записи и построенные по ним индексы.
+    Объект не меняется после загрузки — при изменении файла хранилище создаёт новый.
+    """
+    def __init__(self, path: str, records: List[Dict[str, Any]], version: Tuple[int, int]):
+        self.path = path
+        self.records = records
+        # Версия файла: (mtime в наносекундах, размер в байтах)
+        self.version = version
+        self._indexes: Dict[str, Any] = {}
+        # RLock: один индекс может строиться поверх другого (например, нечёткий поверх индекса названий)
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def index(self, name: str, builder: Callable[[List[Dict[str, Any]]], Any]) -> Any:
+        """
+        Возвращает индекс с именем name, строя его функцией builder
+        только один раз на каждую загрузку файла.
+        """
+        index = self._indexes.get(name)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(name)
+                if index is None:
+                    index = builder(self.records)
+                    self._indexes[name] = index
+        return index
+
+
+# ====================== ХРАНИЛИЩЕ КАТАЛОГОВ ======================
+
+class CatalogStore:
+    """
+    Общее хранилище JSON-каталогов (tea_data.json, orders.json, similar_products.json).
+    Каждый файл читается один раз и перечитывается, только когда у него
+    изменились mtime или размер.
+    """
+    def __init__(self):
+        self._catalogs: Dict[str, Catalog] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> Catalog:
+        """Возвращает актуальный снимок файла, при необходимости перечитывая его."""
+        key = os.path.abspath(path)
+        version = file_version(key)
+
+        catalog = self._catalogs.get(key)
+        if catalog is not None and catalog.version == version:
+            return catalog
+
+        with self._lock:
+            # Файл мог уже перечитать другой поток, пока мы ждали блокировку
+            catalog = self._catalogs.get(key)
+            if catalog is not None and catalog.version == version:
+                return catalog
+
+            with open(key, "r", encoding="utf-8") as f:
+                records = json.load(f)
+            catalog = Catalog(key, records, version)
+            self._catalogs[key] = catalog
+            return catalog
+
+    def records(self, path: str) -> List[Dict[str, Any]]:
+        """Короткий вариант get(path).records для инструментов."""
+        return self.get(path).records
+
+
+# Один экземпляр на весь процесс: его используют все инструменты
+catalog_store = CatalogStore()
@@ -0,0 +1,255 @@
+import argparse
+import atexit
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+# Журнал разговоров в формате JSON Lines: одна строка — один ход (вопрос и ответ).
+# Запись в журнал не ждёт диска: log() кладёт запись в очередь, фоновый поток раз в
+# flush_interval секунд (или когда накопилось batch_size записей) дописывает их в конец файла
+# одним write(). Когда файл превышает max_bytes, он переименовывается в <файл>.1, .2, ...
+# (хранится backups старых частей).
+# Если журнала ещё нет, а есть прежний conversation_log.json (seed_path), его записи
+# переносятся в начало журнала, так что история не теряется.
+# Экспорт обратно в прежний формат conversation_log.json (JSON-массив) — из корня проекта:
+#   python backend/conversation_log.py export conversation_log.jsonl conversation_log.json
+#   python backend/conversation_log.py export conversation_log.jsonl conversation_log.json --prune
+# Экспорт не перезапишет conversation_log.json, если в нём есть записи, которых нет в журнале
+# (нужен --force).
+
+DEFAULT_LOG_PATH = "conversation_log.jsonl"
+# Прежний журнал parser.py: JSON-массив [{"question": ..., "answer": ...}]
+LEGACY_LOG_PATH = "conversation_log.json"
+MAX_BYTES = 10 * 1024 * 1024
+BACKUPS = 5
+FLUSH_INTERVAL = 1.0
+BATCH_SIZE = 256
+# Больше записей в очереди не держим: при отставании диска новые записи отбрасываются и считаются
+MAX_QUEUE = 10000
+
+
+class ConversationLogger:
+    """
+    Буферизованный журнал JSONL с фоновой записью и ротацией по размеру.
+    Потокобезопасен; несколько процессов могут писать в один файл (O_APPEND, строка за один write),
+    но ротацию тогда лучше оставить одному из них (max_bytes=None у остальных).
+    """
+    def __init__(
+        self,
+        path: str = DEFAULT_LOG_PATH,
+        max_bytes: Optional[int] = MAX_BYTES,
+        backups: int = BACKUPS,
+        flush_interval: float = FLUSH_INTERVAL,
+        batch_size: int = BATCH_SIZE,
+        max_queue: int = MAX_QUEUE,
+        seed_path: Optional[str] = None,
+    ):
+        self.path = path
+        if seed_path:
+            seed_from_json(path, seed_path)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=max_queue)
+        self._flushed = threading.Condition()
+        self._pending = 0
+        self.dropped = 0
+        self.written = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="conversation-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ---------------------- Запись ----------------------
+
+    def log(self, question: str, answer: str, **extra: Any) -> None:
+        """Не блокирует: запись уходит в очередь фонового потока."""
+        entry = {"question": question, "answer": answer, "ts": round(time.time(), 3), **extra}
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._flushed:
+            if self._closed:
+                return
+            self._pending += 1
+        try:
+            self._queue.put_nowait(line)
+        except queue.Full:
+            with self._flushed:
+                self._pending -= 1
+                self.dropped += 1
+                self._flushed.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Ждёт, пока всё, что было в очереди, окажется в файле. False — не успели за timeout."""
+        self._queue.put(None)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._flushed:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._flushed.wait(remaining)
+        return True
+
+    def close(self) -> None:
+        with self._flushed:
+            if self._closed:
+                return
+            self._closed = True
+        self.flush(timeout=10)
+        # Будим поток: он увидит _closed и пустую очередь и завершится
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+
+    # ---------------------- Фоновый поток ----------------------
+
+    def _run(self) -> None:
+        while True:
+            batch: List[str] = []
+            try:
+                line = self._queue.get(timeout=self.flush_interval)
+                if line is not None:
+                    batch.append(line)
+                    # Забираем всё, что уже накопилось, но не больше batch_size за раз
+                    while len(batch) < self.batch_size:
+                        line = self._queue.get_nowait()
+                        if line is None:
+                            break
+                        batch.append(line)
+            except queue.Empty:
+                pass
+            if batch:
+                self._write(batch)
+            if self._closed and self._queue.empty():
+                with self._flushed:
+                    if not self._pending:
+                        return
+
+    def _write(self, lines: List[str]) -> None:
+        data = "".join(lines).encode("utf-8")
+        try:
+            if self.max_bytes and os.path.exists(self.path) and os.path.getsize(self.path) + len(data) > self.max_bytes:
+                self._rotate()
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+            self.written += len(lines)
+        except OSError as e:
+            # Журнал не должен ронять сервис: теряем пачку и пишем об этом в stderr
+            self.dropped += len(lines)
+            print(f"conversation_log: не удалось записать {len(lines)} записей: {e}")
+        finally:
+            with self._flushed:
+                self._pending -= len(lines)
+                self._flushed.notify_all()
+
+    def _rotate(self) -> None:
+        """<файл>.N-1 -> <файл>.N, ..., <файл> -> <файл>.1; самая старая часть удаляется."""
+        if self.backups <= 0:
+            os.remove(self.path)
+            return
+        for i in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+
+# ====================== ЧТЕНИЕ И ЭКСПОРТ ======================
+
+def log_segments(path: str) -> List[str]:
+    """Части журнала от самой старой к текущей: <файл>.N, ..., <файл>.1, <файл>."""
+    rotated = [p for p in glob.glob(glob.escape(path) + ".*") if p.rsplit(".", 1)[-1].isdigit()]
+    rotated.sort(key=lambda p: int(p.rsplit(".", 1)[-1]), reverse=True)
+    return rotated + ([path] if os.path.exists(path) else [])
+
+
+def iter_entries(path: str) -> Iterator[Dict[str, Any]]:
+    """Все записи журнала по порядку; оборванная последняя строка (запись прервалась) пропускается."""
+    for segment in log_segments(path):
+        with open(segment, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+
+def _read_json_array(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [{"question": e.get("question"), "answer": e.get("answer")} for e in json.load(f)]
+
+
+def seed_from_json(path: str, legacy_path: str = LEGACY_LOG_PATH) -> int:
+    """
+    Переносит записи прежнего JSON-массива в новый журнал, если журнала (ни одной его части) ещё нет.
+    Возвращает число перенесённых записей.
+    """
+    if log_segments(path) or not os.path.exists(legacy_path):
+        return 0
+    entries = _read_json_array(legacy_path)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries)
+    os.replace(tmp_path, path)
+    return len(entries)
+
+
+def export_json(path: str, output_path: str, prune: bool = False, force: bool = False) -> int:
+    """
+    Сжимает журнал (все части) в JSON-массив прежнего формата conversation_log.json:
+    [{"question": ..., "answer": ...}]. prune — удалить части журнала после экспорта.
+    Существующий output_path перезаписывается, только если его записи — начало журнала
+    (как после seed_from_json) или force=True; иначе FileExistsError.
+    """
+    segments = log_segments(path)
+    entries = [{"question": e.get("question"), "answer": e.get("answer")} for e in iter_entries(path)]
+    if not force and os.path.exists(output_path):
+        existing = _read_json_array(output_path)
+        if entries[:len(existing)] != existing:
+            raise FileExistsError(
+                f"{output_path} содержит записи, которых нет в журнале {path} "
+                f"({len(existing)} в файле, {len(entries)} в журнале); для перезаписи укажите --force"
+            )
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, output_path)
+    if prune:
+        for segment in segments:
+            os.remove(segment)
+    return len(entries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Журнал разговоров (JSON Lines)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export = commands.add_parser("export", help="выгрузить журнал в JSON-массив (формат conversation_log.json)")
+    export.add_argument("log", nargs="?", default=DEFAULT_LOG_PATH)
+    export.add_argument("output", nargs="?", default="conversation_log.json")
+    export.add_argument("--prune", action="store_true",
+                        help="удалить части журнала после экспорта (когда в журнал никто не пишет)")
+    export.add_argument("--force", action="store_true",
+                        help="перезаписать output, даже если в нём есть записи, которых нет в журнале")
+    args = parser.parse_args()
+
+    try:
+        count = export_json(args.log, args.output, prune=args.prune, force=args.force)
+    except FileExistsError as e:
+        raise SystemExit(str(e))
+    print(f"Записей: {count} -> {args.output}")
@@ -0,0 +1,60 @@
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain.chains.question_answering import load_qa_chain
+from langchain.docstore.document import Document
+
+# Ответы на вопросы по документам (pars.pdf, pars.docx) для parser.py.
+# Цепочка "stuff" (та же, что внутри RetrievalQA.from_chain_type) собирается один раз,
+# поиск по индексу выполняется один раз на вопрос, и найденные чанки сразу передаются в модель.
+# В пакетном режиме все вопросы кодируются одним вызовом модели эмбеддингов,
+# а top-k для всех ищется одним запросом к FAISS.
+# Вместо чисто плотного поиска можно передать retriever — например, HybridRetriever
+# из hybrid_retrieval.py (BM25 + FAISS с RRF и опциональным cross-encoder).
+
+TOP_K = 3
+
+
+class DocumentQAEngine:
+    """
+    Переиспользуемый движок вопрос-ответ поверх LangChain FAISS:
+      - retrieve / retrieve_batch — поиск чанков (один вопрос или пачка вопросов);
+      - answer — ответ модели по уже найденным чанкам, без повторного поиска.
+    """
+    def __init__(self, llm: Any, vectorstore: Any, top_k: int = TOP_K, retriever: Any = None):
+        self.vectorstore = vectorstore
+        self.top_k = top_k
+        # Объект с методами retrieve(question, k) и retrieve_batch(questions, k); None — только FAISS
+        self.retriever = retriever
+        self.qa_chain = load_qa_chain(llm, chain_type="stuff")
+
+    # ---------------------- Поиск ----------------------
+
+    def retrieve(self, question: str, k: Optional[int] = None) -> List[Document]:
+        if self.retriever is not None:
+            return self.retriever.retrieve(question, k or self.top_k)
+        return self.vectorstore.similarity_search(question, k=k or self.top_k)
+
+    def retrieve_batch(self, questions: Sequence[str], k: Optional[int] = None) -> List[List[Document]]:
+        """Один вызов модели эмбеддингов на все вопросы и один поиск top-k по матрице запросов."""
+        if not questions:
+            return []
+        if self.retriever is not None:
+            return self.retriever.retrieve_batch(questions, k or self.top_k)
+        vectors = np.asarray(self.vectorstore.embedding_function.embed_documents(list(questions)), dtype=np.float32)
+        _, ids = self.vectorstore.index.search(vectors, k or self.top_k)
+        return [self._documents(row) for row in ids]
+
+    def _documents(self, ids: np.ndarray) -> List[Document]:
+        # -1 — FAISS вернул меньше k результатов
+        docstore_ids = [self.vectorstore.index_to_docstore_id[int(i)] for i in ids if i != -1]
+        return [self.vectorstore.docstore.search(docstore_id) for docstore_id in docstore_ids]
+
+    # ---------------------- Ответ ----------------------
+
+    def answer(self, question: str, docs: Optional[List[Document]] = None) -> Tuple[str, List[Document]]:
+        """Ответ модели и чанки, по которым он дан; если docs не переданы, выполняется один поиск."""
+        if docs is None:
+            docs = self.retrieve(question)
+        response = self.qa_chain.invoke({"input_documents": docs, "question": question})["output_text"]
+        return response, docs
@@ -0,0 +1,323 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+from langchain.docstore.document import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+from answer_cache import DEFAULT_EMBEDDING_MODEL
+from catalog import file_version
+
+# Векторный индекс документов для parser.py, сохраняемый на диск.
+# В каталоге DOC_INDEX_DIR лежат:
+#   index.faiss   — FAISS (IndexIDMap2 поверх IndexFlatL2), при старте открывается через mmap;
+#   chunks.json   — тексты и метаданные чанков по id вектора;
+#   manifest.json — модель, параметры нарезки и для каждого исходного файла: sha1, версия и id его чанков.
+# При запуске заново разбираются и кодируются только добавленные или изменённые файлы,
+# чанки удалённых файлов убираются из индекса.
+# Файлы разбираются в пуле процессов, чанки по мере готовности уходят пачками в модель эмбеддингов
+# и сразу дописываются в индекс. Ручное обновление из корня проекта (файлы и/или каталоги):
+#   python backend/document_index.py pars.pdf pars.docx
+#   python backend/document_index.py specs/ --workers 8
+
+DOC_INDEX_DIR = ".doc_index"
+# Многоязычная модель (документы на русском); при смене модели индекс пересобирается по манифесту
+DOC_EMBEDDING_MODEL = DEFAULT_EMBEDDING_MODEL
+CHUNK_SIZE = 600
+CHUNK_OVERLAP = 200
+EMBED_BATCH_SIZE = 256
+SUPPORTED_EXTENSIONS = (".pdf", ".docx")
+
+INDEX_FILENAME = "index.faiss"
+CHUNKS_FILENAME = "chunks.json"
+MANIFEST_FILENAME = "manifest.json"
+
+
+def file_sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def expand_sources(paths: Sequence[str]) -> List[str]:
+    """Файлы PDF/DOCX из списка путей; каталоги обходятся рекурсивно, временные файлы Word (~$...) пропускаются."""
+    files = []
+    for path in paths:
+        if not os.path.isdir(path):
+            files.append(path)
+            continue
+        for root, _, names in os.walk(path):
+            for name in sorted(names):
+                if name.lower().endswith(SUPPORTED_EXTENSIONS) and not name.startswith("~$"):
+                    files.append(os.path.join(root, name))
+    return sorted(dict.fromkeys(files))
+
+
+def load_chunks(path: str, chunk_size: int, chunk_overlap: int) -> Tuple[int, List[Document]]:
+    """
+    Разбор одного файла и нарезка на чанки: (число страниц, чанки).
+    Выполняется в процессе пула, поэтому функция верхнего уровня и получает только простые аргументы.
+    """
+    # Импорт здесь: unstructured нужен, только если есть новые или изменённые файлы
+    if path.lower().endswith(".docx"):
+        from langchain_community.document_loaders import UnstructuredWordDocumentLoader as Loader
+    else:
+        from langchain_community.document_loaders import UnstructuredPDFLoader as Loader
+    # mode="paged": по документу на страницу, номер страницы остаётся в метаданных чанков
+    pages = Loader(path, mode="paged").load()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    return len(pages), splitter.split_documents(pages)
+
+
+class DocumentIndex:
+    """
+    FAISS-индекс чанков документов с манифестом исходных файлов.
+    sync(sources) приводит индекс в соответствие со списком файлов и каталогов и возвращает
+    LangChain FAISS, готовый для as_retriever().
+    """
+    def __init__(
+        self,
+        store_dir: Optional[str] = DOC_INDEX_DIR,
+        embedding: Any = None,
+        model_name: str = DOC_EMBEDDING_MODEL,
+        chunk_size: int = CHUNK_SIZE,
+        chunk_overlap: int = CHUNK_OVERLAP,
+        workers: Optional[int] = None,
+        embed_batch_size: int = EMBED_BATCH_SIZE,
+    ):
+        self.store_dir = store_dir
+        self.model_name = model_name
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        # Процессов для разбора файлов; None — по числу ядер
+        self.workers = workers or os.cpu_count() or 1
+        self.embed_batch_size = embed_batch_size
+        self._embedding = embedding
+        self._lock = threading.Lock()
+        # Последняя синхронизация: сколько файлов разобрано заново, удалено и осталось без изменений,
+        # плюс пропускная способность разбора (страниц и чанков в секунду)
+        self.last_sync: Dict[str, int] = {}
+
+    @property
+    def embedding(self) -> Any:
+        if self._embedding is None:
+            from langchain_community.embeddings import HuggingFaceEmbeddings
+            self._embedding = HuggingFaceEmbeddings(model_name=self.model_name)
+        return self._embedding
+
+    def _settings(self) -> Dict[str, Any]:
+        # При смене любого из параметров индекс собирается заново
+        return {"model": self.model_name, "chunk_size": self.chunk_size, "chunk_overlap": self.chunk_overlap}
+
+    # ---------------------- Файлы индекса ----------------------
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.store_dir, name)
+
+    def _load(self, mmap: bool) -> Tuple[Optional[Any], Dict[str, Any], Dict[str, Any]]:
+        """Индекс, чанки и манифест с диска; если чего-то нет или файлы не сходятся — пустые."""
+        empty = {**self._settings(), "next_id": 0, "files": {}}
+        if not self.store_dir or not all(
+            os.path.exists(self._path(name)) for name in (INDEX_FILENAME, CHUNKS_FILENAME, MANIFEST_FILENAME)
+        ):
+            return None, {}, empty
+        try:
+            with open(self._path(MANIFEST_FILENAME), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            with open(self._path(CHUNKS_FILENAME), "r", encoding="utf-8") as f:
+                chunks = json.load(f)
+            # mmap: векторы не читаются в память целиком, страницы подгружает ОС по мере поиска
+            flags = faiss.IO_FLAG_MMAP_IFC if mmap else 0
+            index = faiss.read_index(self._path(INDEX_FILENAME), flags)
+        except (OSError, ValueError, RuntimeError):
+            return None, {}, empty
+
+        if any(manifest.get(key) != value for key, value in self._settings().items()):
+            return None, {}, empty
+        total = sum(len(entry["ids"]) for entry in manifest["files"].values())
+        if index.ntotal != total or len(chunks) != total:
+            return None, {}, empty
+        return index, chunks, manifest
+
+    def _save(self, index: Any, chunks: Dict[str, Any], manifest: Dict[str, Any]) -> None:
+        if not self.store_dir:
+            return
+        os.makedirs(self.store_dir, exist_ok=True)
+        # Манифест пишется последним: если запись оборвётся, счётчики не сойдутся и индекс соберётся заново
+        faiss.write_index(index, self._path(INDEX_FILENAME) + ".tmp")
+        os.replace(self._path(INDEX_FILENAME) + ".tmp", self._path(INDEX_FILENAME))
+        for name, data in ((CHUNKS_FILENAME, chunks), (MANIFEST_FILENAME, manifest)):
+            with open(self._path(name) + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(self._path(name) + ".tmp", self._path(name))
+
+    # ---------------------- Синхронизация ----------------------
+
+    def _changed_files(self, files: Sequence[str], manifest: Dict[str, Any]) -> Tuple[Dict[str, str], List[str], bool]:
+        """
+        Файлы, которые нужно разобрать заново (путь -> sha1), файлы, пропавшие из списка,
+        и признак, что у кого-то из оставшихся поменялась только версия.
+        Сначала сравнивается версия (mtime, размер), sha1 считается только если она изменилась.
+        """
+        changed: Dict[str, str] = {}
+        touched = False
+        for path in files:
+            entry = manifest["files"].get(path)
+            version = list(file_version(path))
+            if entry is not None and entry["version"] == version:
+                continue
+            sha1 = file_sha1(path)
+            if entry is not None and entry["sha1"] == sha1:
+                # Файл только «тронули» — обновим версию, разбирать не нужно
+                entry["version"] = version
+                touched = True
+                continue
+            changed[path] = sha1
+        wanted = set(files)
+        removed = [path for path in manifest["files"] if path not in wanted]
+        return changed, removed, touched
+
+    def sync(self, sources: Sequence[str]) -> FAISS:
+        """sources — файлы и/или каталоги с PDF/DOCX."""
+        files = expand_sources(sources)
+        with self._lock:
+            index, chunks, manifest = self._load(mmap=True)
+            changed, removed, touched = self._changed_files(files, manifest)
+
+            stats: Dict[str, Any] = {}
+            if changed or removed:
+                if index is not None:
+                    # Индекс открыт через mmap только для чтения — для правки перечитываем его целиком
+                    index = faiss.read_index(self._path(INDEX_FILENAME))
+                index = self._remove(index, chunks, manifest, list(changed) + removed)
+                for path in removed:
+                    del manifest["files"][path]
+                index, stats = self._ingest(index, chunks, manifest, changed)
+            if (changed or removed or touched) and index is not None:
+                self._save(index, chunks, manifest)
+
+            self.last_sync = {
+                "parsed": len(changed),
+                "removed": len(removed),
+                "unchanged": len(files) - len(changed),
+                **stats,
+            }
+            return self._vectorstore(index, chunks)
+
+    def _remove(self, index: Optional[Any], chunks: Dict[str, Any], manifest: Dict[str, Any],
+                paths: List[str]) -> Optional[Any]:
+        """Убирает из индекса и хранилища чанки перечисленных файлов."""
+        stale_ids = [
+            vector_id for path in paths
+            for vector_id in manifest["files"].get(path, {}).get("ids", [])
+        ]
+        if stale_ids and index is not None:
+            index.remove_ids(np.array(stale_ids, dtype=np.int64))
+        for vector_id in stale_ids:
+            chunks.pop(str(vector_id), None)
+        return index
+
+    def _ingest(self, index: Optional[Any], chunks: Dict[str, Any], manifest: Dict[str, Any],
+                changed: Dict[str, str]) -> Tuple[Optional[Any], Dict[str, Any]]:
+        """
+        Разбирает файлы в пуле процессов. Чанки готовых файлов копятся в буфере и, как только
+        набирается embed_batch_size, одним вызовом кодируются и дописываются в индекс —
+        модель эмбеддингов работает, пока пул разбирает остальные файлы.
+        """
+        started = time.perf_counter()
+        pending_ids: List[int] = []
+        pending_texts: List[str] = []
+        pages_total = 0
+        chunks_total = 0
+
+        def flush():
+            nonlocal index
+            if not pending_ids:
+                return
+            vectors = np.asarray(self.embedding.embed_documents(pending_texts), dtype=np.float32)
+            if index is None:
+                index = faiss.IndexIDMap2(faiss.IndexFlatL2(vectors.shape[1]))
+            index.add_with_ids(vectors, np.array(pending_ids, dtype=np.int64))
+            pending_ids.clear()
+            pending_texts.clear()
+
+        def collect(path: str, pages: int, docs: List[Document]):
+            nonlocal pages_total, chunks_total
+            ids = list(range(manifest["next_id"], manifest["next_id"] + len(docs)))
+            manifest["next_id"] += len(docs)
+            for vector_id, doc in zip(ids, docs):
+                chunks[str(vector_id)] = {"text": doc.page_content, "metadata": doc.metadata}
+                pending_ids.append(vector_id)
+                pending_texts.append(doc.page_content)
+                if len(pending_ids) >= self.embed_batch_size:
+                    flush()
+            manifest["files"][path] = {"sha1": changed[path], "version": list(file_version(path)), "ids": ids}
+            pages_total += pages
+            chunks_total += len(docs)
+
+        if self.workers > 1 and len(changed) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(changed))) as pool:
+                futures = {
+                    pool.submit(load_chunks, path, self.chunk_size, self.chunk_overlap): path
+                    for path in changed
+                }
+                for future in as_completed(futures):
+                    collect(futures[future], *future.result())
+        else:
+            for path in changed:
+                collect(path, *load_chunks(path, self.chunk_size, self.chunk_overlap))
+        flush()
+
+        seconds = time.perf_counter() - started
+        stats = {
+            "pages": pages_total,
+            "chunks": chunks_total,
+            "seconds": round(seconds, 3),
+            "pages_per_sec": round(pages_total / seconds, 1) if seconds else 0.0,
+            "chunks_per_sec": round(chunks_total / seconds, 1) if seconds else 0.0,
+        }
+        return index, stats
+
+    def _vectorstore(self, index: Optional[Any], chunks: Dict[str, Any]) -> FAISS:
+        """LangChain FAISS поверх готового индекса: id вектора в IndexIDMap2 и есть ключ docstore."""
+        if index is None:
+            dimension = len(self.embedding.embed_query("0"))
+            index = faiss.IndexIDMap2(faiss.IndexFlatL2(dimension))
+        docstore = InMemoryDocstore({
+            vector_id: Document(page_content=chunk["text"], metadata=chunk["metadata"])
+            for vector_id, chunk in chunks.items()
+        })
+        return FAISS(
+            embedding_function=self.embedding,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id={int(vector_id): vector_id for vector_id in chunks},
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Обновление индекса документов (PDF/DOCX)")
+    parser.add_argument("sources", nargs="*", default=["pars.pdf", "pars.docx"], help="файлы и/или каталоги")
+    parser.add_argument("--workers", type=int, default=None, help="процессов для разбора (по умолчанию — ядра)")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="чанков на вызов модели")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    document_index = DocumentIndex(workers=args.workers, embed_batch_size=args.batch_size)
+    vectorstore = document_index.sync(args.sources)
+    print(
+        f"Чанков в индексе: {vectorstore.index.ntotal}; файлы: {document_index.last_sync}; "
+        f"{time.perf_counter() - started:.2f} с"
+    )
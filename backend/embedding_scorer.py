@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from answer_cache import DEFAULT_EMBEDDING_MODEL
+
+# Кеш эмбеддингов между запусками: эталонные ответы не меняются, ответы модели — частично
+EMBEDDING_CACHE_DIR = os.path.join("backend", "test_results", ".embedding_cache")
+BATCH_SIZE = 64
+
+# Правило итогового балла из accuracy.py: >= 0.75 — 100%, от 0.5 до 0.75 — сходство в процентах, ниже — 0
+FULL_SCORE_THRESHOLD = 0.75
+PARTIAL_SCORE_THRESHOLD = 0.5
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Нормированные эмбеддинги текстов с кешем на диске (ключ — sha1 текста).
+    Модель загружается, только если в кеше чего-то нет; новые тексты кодируются пачками.
+    """
+    def __init__(
+        self,
+        model_name: str = DEFAULT_EMBEDDING_MODEL,
+        cache_dir: Optional[str] = EMBEDDING_CACHE_DIR,
+        encoder: Optional[Callable[[List[str]], np.ndarray]] = None,
+        batch_size: int = BATCH_SIZE,
+    ):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._encoder = encoder
+        self.path = (
+            os.path.join(cache_dir, model_name.replace("/", "__") + ".npz") if cache_dir else None
+        )
+        self._rows: Dict[str, int] = {}
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self.encoded = 0
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        with np.load(self.path) as data:
+            keys = data["keys"]
+            self._vectors = data["vectors"]
+        self._rows = {str(key): row for row, key in enumerate(keys)}
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        keys = np.array(sorted(self._rows, key=self._rows.get))
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, keys=keys, vectors=self._vectors)
+        os.replace(tmp_path, self.path)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if self._encoder is None:
+            # Импорт здесь: если всё уже в кеше, модель не нужна вовсе
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(self.model_name)
+            self._encoder = lambda batch: model.encode(
+                batch, batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True
+            )
+        return np.asarray(self._encoder(texts), dtype=np.float32)
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Матрица (len(texts), dim): недостающие тексты кодируются пачками и дописываются в кеш."""
+        keys = [text_key(text) for text in texts]
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in self._rows and key not in missing:
+                missing[key] = text
+
+        if missing:
+            new_keys = list(missing)
+            chunks = [
+                self._encode([missing[key] for key in new_keys[i:i + self.batch_size]])
+                for i in range(0, len(new_keys), self.batch_size)
+            ]
+            new_vectors = np.concatenate(chunks)
+            # Нормируем на случай стороннего encoder'а: тогда сходство — просто скалярное произведение
+            norms = np.linalg.norm(new_vectors, axis=1, keepdims=True)
+            new_vectors = new_vectors / np.maximum(norms, 1e-12)
+
+            start = len(self._rows)
+            self._vectors = new_vectors if start == 0 else np.concatenate([self._vectors, new_vectors])
+            for offset, key in enumerate(new_keys):
+                self._rows[key] = start + offset
+            self.encoded += len(new_keys)
+            self.save()
+
+        if not keys:
+            return np.zeros((0, self._vectors.shape[1] if self._vectors.size else 0), dtype=np.float32)
+        return self._vectors[[self._rows[key] for key in keys]]
+
+
+# ====================== ОЦЕНКА ======================
+
+def cosine_similarities(cache: EmbeddingCache, references: Sequence[str], answers: Sequence[str]) -> np.ndarray:
+    """Сходство каждой пары (эталон, ответ) за один проход: построчное скалярное произведение."""
+    if not references:
+        return np.zeros(0, dtype=np.float32)
+    embeddings = cache.embed(list(references) + list(answers))
+    ref_embeddings, answer_embeddings = embeddings[:len(references)], embeddings[len(references):]
+    return np.einsum("ij,ij->i", ref_embeddings, answer_embeddings)
+
+
+def threshold_scores(similarities: np.ndarray) -> np.ndarray:
+    """Векторная версия calculate_score из accuracy.py."""
+    return np.where(
+        similarities >= FULL_SCORE_THRESHOLD,
+        100.0,
+        np.where(similarities >= PARTIAL_SCORE_THRESHOLD, similarities * 100, 0.0),
+    )
+
+
+def load_references(questions_dir: str) -> Dict[str, str]:
+    """Эталонные ответы из всех наборов вопросов: вопрос -> "Эталонный ответ"."""
+    references = {}
+    for name in sorted(os.listdir(questions_dir)):
+        if not name.endswith(".json"):
+            continue
+        with open(os.path.join(questions_dir, name), "r", encoding="utf-8") as f:
+            for item in json.load(f):
+                if item.get("Вопрос") and item.get("Эталонный ответ") is not None:
+                    references[item["Вопрос"].strip()] = str(item["Эталонный ответ"]).strip()
+    return references
+
+
+def match_pairs(responses_path: str, references: Dict[str, str]):
+    """Пары (вопрос, эталонный ответ, ответ модели) по полю "Вопрос"."""
+    with open(responses_path, "r", encoding="utf-8") as f:
+        model_data = json.load(f)
+    return [
+        (item["Вопрос"].strip(), references[item["Вопрос"].strip()], item.get("Ответ модели") or "")
+        for item in model_data
+        if (item.get("Вопрос") or "").strip() in references
+    ]
+
+
+def format_report(pairs, similarities: np.ndarray, scores: np.ndarray) -> str:
+    """Отчёт в том же виде, что писал accuracy.py."""
+    lines = ["----- Итоговые результаты -----\n"]
+    for i, (question, ref_answer, model_answer) in enumerate(pairs):
+        lines.append(f"Пара {i+1}:\n")
+        lines.append(f"  Вопрос:            {question}\n")
+        lines.append(f"  Эталонный ответ:   {ref_answer}\n")
+        lines.append(f"  Ответ модели:      {model_answer}\n")
+        lines.append(f"  Cosine Similarity: {similarities[i]:.4f}\n")
+        lines.append(f"  Итоговый балл:     {scores[i]:.2f}%\n\n")
+    mean_similarity = float(similarities.mean()) if len(pairs) else 0.0
+    mean_score = float(scores.mean()) if len(pairs) else 0.0
+    lines.append("----- Сводка по всем парам -----\n")
+    lines.append(f"Средняя Cosine Similarity (SBERT): {mean_similarity:.4f}\n")
+    lines.append(f"Средний итоговый балл: {mean_score:.2f}%\n")
+    return "".join(lines)
@@ -0,0 +1,198 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from embedding_scorer import EmbeddingCache, cosine_similarities, load_references, match_pairs, threshold_scores
+
+# Единая оценка ответов модели: точное совпадение, Sentence-BERT и BERTScore за один запуск.
+# Запуск из корня проекта:
+#   python backend/evaluate.py                      — все категории, все метрики
+#   python backend/evaluate.py --metrics exact sbert --categories prices orders
+# Отчёты: backend/test_results/<категория>_report.txt и сводка summary.json.
+
+QUESTIONS_DIR = "questions"
+RESPONSES_DIR = os.path.join("backend", "responses")
+RESULTS_DIR = os.path.join("backend", "test_results")
+BERTSCORE_CACHE_PATH = os.path.join(RESULTS_DIR, ".embedding_cache", "bertscore.json")
+
+# Категория -> файл ответов модели в backend/responses
+CATEGORIES = {
+    "prices": "tea_prices.json",
+    "descriptions": "tea_descriptions.json",
+    "orders": "orders_responses.json",
+    "similar": "similar_responses.json",
+    "hard": "hard_quetions.json",
+}
+METRICS = ["exact", "sbert", "bertscore"]
+
+BERTSCORE_LANG = "ru"
+BERTSCORE_BATCH_SIZE = 64
+
+_SPACES_RE = re.compile(r"\s+")
+
+
+# ====================== МЕТРИКИ ======================
+
+def _normalize(text: str) -> str:
+    return _SPACES_RE.sub(" ", text.lower().replace("ё", "е")).strip()
+
+
+def exact_match(references: Sequence[str], answers: Sequence[str]) -> np.ndarray:
+    """
+    Как в accuracy_zhosko.py: 100, если эталон целиком содержится в ответе модели, иначе 0.
+    Регистр, ё/е и пробелы не учитываются.
+    """
+    return np.array(
+        [100.0 if _normalize(ref) in _normalize(answer) else 0.0 for ref, answer in zip(references, answers)]
+    )
+
+
+class BERTScoreCache:
+    """BERTScore F1 по парам с кешем на диске: повторная оценка считает только новые пары."""
+    def __init__(self, path: Optional[str] = BERTSCORE_CACHE_PATH, lang: str = BERTSCORE_LANG,
+                 batch_size: int = BERTSCORE_BATCH_SIZE):
+        self.path = path
+        self.lang = lang
+        self.batch_size = batch_size
+        self._scorer = None
+        self._scores: Dict[str, float] = {}
+        self.computed = 0
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._scores = json.load(f)
+
+    def _key(self, reference: str, answer: str) -> str:
+        return hashlib.sha1(f"{self.lang}\x00{reference}\x00{answer}".encode("utf-8")).hexdigest()
+
+    def f1(self, references: Sequence[str], answers: Sequence[str]) -> np.ndarray:
+        keys = [self._key(ref, answer) for ref, answer in zip(references, answers)]
+        missing = {}
+        for key, ref, answer in zip(keys, references, answers):
+            if key not in self._scores:
+                missing[key] = (ref, answer)
+
+        if missing:
+            if self._scorer is None:
+                # Модель грузится один раз и только если есть новые пары
+                from bert_score import BERTScorer
+                self._scorer = BERTScorer(lang=self.lang, batch_size=self.batch_size)
+            new_keys = list(missing)
+            _, _, f1 = self._scorer.score(
+                [missing[key][1] for key in new_keys],
+                [missing[key][0] for key in new_keys],
+            )
+            for key, value in zip(new_keys, f1.tolist()):
+                self._scores[key] = value
+            self.computed += len(new_keys)
+            if self.path:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, "w", encoding="utf-8") as f:
+                    json.dump(self._scores, f)
+
+        return np.array([self._scores[key] for key in keys])
+
+
+# ====================== ОТЧЁТЫ ======================
+
+def format_report(category: str, pairs, results: Dict[str, np.ndarray]) -> str:
+    lines = [f"===== Категория: {category} =====\n"]
+    lines.extend(_summary_lines(results, len(pairs)))
+    lines.append("----- Итоговые результаты -----\n\n")
+    for i, (question, ref_answer, model_answer) in enumerate(pairs):
+        lines.append(f"Пара {i+1}:\n")
+        lines.append(f"  Вопрос:            {question}\n")
+        lines.append(f"  Эталонный ответ:   {ref_answer}\n")
+        lines.append(f"  Ответ модели:      {model_answer}\n")
+        if "exact" in results:
+            lines.append(f"  Точное совпадение: {results['exact'][i]:.0f}%\n")
+        if "bertscore" in results:
+            lines.append(f"  BERTScore (F1):    {results['bertscore'][i]:.4f}\n")
+        if "sbert" in results:
+            lines.append(f"  Cosine Similarity: {results['sbert'][i]:.4f}\n")
+            lines.append(f"  Итоговый балл:     {results['sbert_score'][i]:.2f}%\n")
+        lines.append("\n")
+    return "".join(lines)
+
+
+def _summary_lines(results: Dict[str, np.ndarray], count: int) -> List[str]:
+    def mean(name):
+        return float(np.mean(results[name])) if count else 0.0
+
+    lines = [f"Пар: {count}\n"]
+    if "exact" in results:
+        lines.append(f"Средняя точность (точное совпадение): {mean('exact'):.2f}%\n")
+    if "bertscore" in results:
+        lines.append(f"Средний BERTScore (F1): {mean('bertscore'):.4f}\n")
+    if "sbert" in results:
+        lines.append(f"Средняя Cosine Similarity (SBERT): {mean('sbert'):.4f}\n")
+        lines.append(f"Средний итоговый балл: {mean('sbert_score'):.2f}%\n")
+    return lines
+
+
+# ====================== ЗАПУСК ======================
+
+def evaluate(categories: Sequence[str], metrics: Sequence[str], responses_dir: str = RESPONSES_DIR,
+             results_dir: str = RESULTS_DIR, embedding_cache: Optional[EmbeddingCache] = None,
+             bertscore_cache: Optional[BERTScoreCache] = None) -> Dict[str, dict]:
+    """
+    Считает метрики для всех категорий разом: пары всех категорий склеиваются,
+    каждая метрика — один пакетный проход (одна загрузка модели), затем результат режется по категориям.
+    """
+    # Наборы вопросов и файлы ответов читаются по одному разу и соединяются по вопросу через словарь
+    references = load_references(QUESTIONS_DIR)
+    pairs_by_category = {}
+    for category in categories:
+        path = os.path.join(responses_dir, CATEGORIES[category])
+        if not os.path.exists(path):
+            print(f"Нет файла ответов для категории {category}: {path}")
+            continue
+        pairs_by_category[category] = match_pairs(path, references)
+
+    all_pairs = [pair for pairs in pairs_by_category.values() for pair in pairs]
+    refs = [pair[1] for pair in all_pairs]
+    answers = [pair[2] for pair in all_pairs]
+
+    all_results: Dict[str, np.ndarray] = {}
+    if "exact" in metrics:
+        all_results["exact"] = exact_match(refs, answers)
+    if "sbert" in metrics:
+        embedding_cache = embedding_cache or EmbeddingCache()
+        all_results["sbert"] = cosine_similarities(embedding_cache, refs, answers)
+        all_results["sbert_score"] = threshold_scores(all_results["sbert"])
+    if "bertscore" in metrics:
+        bertscore_cache = bertscore_cache or BERTScoreCache()
+        all_results["bertscore"] = bertscore_cache.f1(refs, answers)
+
+    summary = {}
+    offset = 0
+    os.makedirs(results_dir, exist_ok=True)
+    for category, pairs in pairs_by_category.items():
+        results = {name: values[offset:offset + len(pairs)] for name, values in all_results.items()}
+        offset += len(pairs)
+
+        report_path = os.path.join(results_dir, f"{category}_report.txt")
+        with open(report_path, "w", encoding="utf-8") as f:
+            f.write(format_report(category, pairs, results))
+        summary[category] = {
+            "pairs": len(pairs),
+            "report": report_path,
+            **{name: round(float(np.mean(values)), 4) if len(pairs) else None for name, values in results.items()},
+        }
+        print("".join([f"== {category}\n"] + _summary_lines(results, len(pairs))))
+
+    with open(os.path.join(results_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Оценка ответов модели по всем категориям")
+    parser.add_argument("--categories", nargs="+", choices=list(CATEGORIES), default=list(CATEGORIES))
+    parser.add_argument("--metrics", nargs="+", choices=METRICS, default=METRICS)
+    args = parser.parse_args()
+    evaluate(args.categories, args.metrics)
@@ -0,0 +1,264 @@
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import gigachat
+import httpx
+from gigachat.api import post_auth
+# Публичного способа передать свой httpx-клиент или keepalive_expiry в gigachat нет,
+# поэтому PooledGigaChat опирается на внутренние _get_kwargs и _access_token.
+# Версия gigachat закреплена в pyproject.toml: при обновлении проверить этот модуль.
+from gigachat.client import _get_kwargs
+from gigachat.models import AccessToken
+from langchain_gigachat.chat_models import GigaChat
+
+from telemetry import log
+
+# Ключ авторизации GigaChat берётся только из переменной окружения
+GIGACHAT_CREDENTIALS = os.environ.get("GIGACHAT_CREDENTIALS")
+GIGACHAT_SCOPE = os.environ.get("GIGACHAT_SCOPE", "GIGACHAT_API_PERS")
+DEFAULT_MODEL = "GigaChat-2-Max"
+
+# Пул соединений: сколько держать открытыми и сколько секунд живёт простаивающее соединение
+# (у httpx по умолчанию 5 секунд — после паузы в диалоге каждый запрос снова платил бы за TLS)
+MAX_CONNECTIONS = int(os.environ.get("GIGACHAT_MAX_CONNECTIONS", "32"))
+KEEPALIVE_EXPIRY = float(os.environ.get("GIGACHAT_KEEPALIVE_EXPIRY", "120"))
+# Раз в сколько секунд фоновый поток «пингует» API, чтобы соединение не закрылось (0 — не пинговать)
+KEEPALIVE_INTERVAL = float(os.environ.get("GIGACHAT_KEEPALIVE_INTERVAL", "60"))
+# Фоновое обновление токена за столько секунд до истечения (токен GigaChat живёт 30 минут)
+REFRESH_MARGIN = 300
+# Если фоновое обновление не успело, запрос сам обновит токен за столько секунд до истечения
+EXPIRY_MARGIN = 30
+
+
+# ====================== ОБЩИЙ ТОКЕН ======================
+
+class _TokenHolder:
+    """Один OAuth-токен на все клиенты с одинаковыми credentials и scope."""
+    def __init__(self):
+        self.token: Optional[AccessToken] = None
+        self.lock = threading.Lock()
+
+    def seconds_left(self) -> Optional[float]:
+        """Сколько секунд осталось жить токену; None — токена нет."""
+        token = self.token
+        if token is None:
+            return None
+        if not token.expires_at:
+            # Токен задан вручную (access_token=...), срок неизвестен
+            return float("inf")
+        # expires_at приходит в миллисекундах
+        return token.expires_at / 1000 - time.time()
+
+
+class PooledGigaChat(gigachat.GigaChat):
+    """
+    Клиент gigachat с общим токеном и пулом keep-alive соединений.
+    В отличие от базового клиента, токен считается недействительным незадолго
+    до истечения, а не только после ответа 401 (иначе запрос платит за лишний круг).
+    """
+    def __init__(self, token_holder: _TokenHolder, limits: httpx.Limits, **kwargs):
+        self._token_holder = token_holder
+        super().__init__(**kwargs)
+        # Блокировка обновления общая для всех клиентов с этим токеном
+        self._sync_token_lock = token_holder.lock
+
+        client_kwargs = _get_kwargs(self._settings)
+        client_kwargs["limits"] = limits
+        self._client.close()
+        self._aclient = httpx.AsyncClient(**client_kwargs)
+        self._client = httpx.Client(**client_kwargs)
+
+    @property
+    def _access_token(self) -> Optional[AccessToken]:
+        return self._token_holder.token
+
+    @_access_token.setter
+    def _access_token(self, token: Optional[AccessToken]) -> None:
+        self._token_holder.token = token
+
+    def _check_validity_token(self) -> bool:
+        seconds_left = self._token_holder.seconds_left()
+        return seconds_left is not None and seconds_left > EXPIRY_MARGIN
+
+    def refresh_token(self) -> None:
+        """Получает новый токен заранее; пока идёт запрос, остальные работают со старым."""
+        if not self._settings.credentials:
+            with self._sync_token_lock:
+                self._reset_token()
+            self._update_token()
+            return
+        token = post_auth.sync(
+            self._auth_client,
+            url=self._settings.auth_url,
+            credentials=self._settings.credentials,
+            scope=self._settings.scope,
+        )
+        with self._sync_token_lock:
+            self._access_token = token
+
+
+# ====================== ФАБРИКА КЛИЕНТОВ ======================
+
+class GigaChatClientFactory:
+    """
+    Общие клиенты GigaChat на весь процесс (app.py, test_model.py, parser.py):
+      - chat_model(model) возвращает один и тот же LangChain-объект для одной модели
+        и одинаковых параметров;
+      - все клиенты используют пул keep-alive соединений и один OAuth-токен;
+      - start() запускает фоновый поток: он сразу получает токен и открывает соединение,
+        затем обновляет токен за REFRESH_MARGIN секунд до истечения и не даёт
+        соединению закрыться от простоя. Запросы пользователей не ждут ни TLS, ни токен.
+    """
+    def __init__(
+        self,
+        credentials: Optional[str] = GIGACHAT_CREDENTIALS,
+        scope: str = GIGACHAT_SCOPE,
+        verify_ssl_certs: bool = False,
+        max_connections: int = MAX_CONNECTIONS,
+        keepalive_expiry: float = KEEPALIVE_EXPIRY,
+        keepalive_interval: float = KEEPALIVE_INTERVAL,
+        refresh_margin: float = REFRESH_MARGIN,
+    ):
+        self.credentials = credentials
+        self.scope = scope
+        self.verify_ssl_certs = verify_ssl_certs
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.keepalive_interval = keepalive_interval
+        self.refresh_margin = refresh_margin
+
+        self._token = _TokenHolder()
+        self._clients: Dict[str, PooledGigaChat] = {}
+        self._models: Dict[Tuple, GigaChat] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _require_credentials(self) -> None:
+        if not self.credentials:
+            raise RuntimeError(
+                "Не задан ключ авторизации GigaChat: укажите его в переменной окружения GIGACHAT_CREDENTIALS"
+            )
+
+    def client(self, model: str = DEFAULT_MODEL) -> PooledGigaChat:
+        """Низкоуровневый клиент для модели (модель задаётся в настройках клиента, а не в запросе)."""
+        self._require_credentials()
+        with self._lock:
+            client = self._clients.get(model)
+            if client is None:
+                client = PooledGigaChat(
+                    self._token,
+                    self.limits,
+                    credentials=self.credentials,
+                    scope=self.scope,
+                    model=model,
+                    verify_ssl_certs=self.verify_ssl_certs,
+                )
+                self._clients[model] = client
+            return client
+
+    def chat_model(self, model: str = DEFAULT_MODEL, **params) -> GigaChat:
+        """LangChain-модель GigaChat поверх общего клиента; params — temperature, streaming и т.п."""
+        key = (model, tuple(sorted(params.items())))
+        client = self.client(model)
+        with self._lock:
+            chat_model = self._models.get(key)
+            if chat_model is None:
+                chat_model = GigaChat(
+                    credentials=self.credentials,
+                    scope=self.scope,
+                    model=model,
+                    verify_ssl_certs=self.verify_ssl_certs,
+                    **params,
+                )
+                # _client у LangChain-модели — cached_property: подставляем общий клиент
+                chat_model.__dict__["_client"] = client
+                self._models[key] = chat_model
+            return chat_model
+
+    # ---------------------- Прогрев и фоновое обновление ----------------------
+
+    def warm_up(self) -> None:
+        """Получает токен и открывает по соединению для каждого клиента."""
+        self._refresh_token()
+        for client in list(self._clients.values()):
+            client.get_models()
+
+    async def awarm_up(self) -> None:
+        """То же для асинхронного пула (вызывать в event loop, где будут идти запросы)."""
+        if self._token.seconds_left() is None:
+            self._refresh_token()
+        for client in list(self._clients.values()):
+            await client.aget_models()
+
+    def _refresh_token(self) -> None:
+        client = next(iter(self._clients.values()), None) or self.client()
+        client.refresh_token()
+        log.info("GigaChat: токен обновлён, действует ещё %.0f с", self._token.seconds_left())
+
+    def start(self) -> None:
+        """Запускает фоновый поток прогрева и обновления токена (повторный вызов ничего не делает)."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="gigachat-keeper", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        failed = False
+        try:
+            self.warm_up()
+        except Exception as e:
+            failed = True
+            log.warning("GigaChat: прогрев не удался: %s", e)
+
+        while True:
+            seconds_left = self._token.seconds_left()
+            if failed or seconds_left is None:
+                # После неудачи пробуем снова не чаще, чем раз в 10 секунд
+                wait = 10.0
+            else:
+                wait = max(seconds_left - self.refresh_margin, 0.0)
+                if self.keepalive_interval:
+                    wait = min(wait, self.keepalive_interval)
+            if self._stop.wait(wait):
+                return
+
+            try:
+                seconds_left = self._token.seconds_left()
+                if seconds_left is None or seconds_left <= self.refresh_margin:
+                    self._refresh_token()
+                elif self.keepalive_interval:
+                    for client in list(self._clients.values()):
+                        client.get_models()
+                failed = False
+            except Exception as e:
+                failed = True
+                log.warning("GigaChat: фоновое обновление не удалось: %s", e)
+
+    def close(self) -> None:
+        self.stop()
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+            self._models.clear()
+
+
+# Общая фабрика процесса
+gigachat_factory = GigaChatClientFactory()
+
+
+def get_chat_model(model: str = DEFAULT_MODEL, **params) -> GigaChat:
+    """Общая LangChain-модель GigaChat; при первом вызове запускает фоновый прогрев."""
+    chat_model = gigachat_factory.chat_model(model, **params)
+    gigachat_factory.start()
+    return chat_model
@@ -0,0 +1,179 @@
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain.docstore.document import Document
+
+# Гибридный поиск по документам для parser.py: BM25 по словам + плотный поиск FAISS,
+# результаты склеиваются по reciprocal rank fusion (RRF). BM25 находит точные названия
+# и цены, которые плотная модель эмбеддингов часто пропускает.
+# Опционально лучшие кандидаты переранжирует локальный cross-encoder.
+# Замеры recall@k и задержки: python backend/bench_retrieval.py
+
+# Сколько кандидатов берёт каждый из поисков перед слиянием
+CANDIDATES = 20
+# Константа RRF: вклад документа на позиции r равен 1 / (RRF_K + r)
+RRF_K = 60
+BM25_K1 = 1.5
+BM25_B = 0.75
+RERANKER_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Слова и числа в нижнем регистре, ё/е не различаются."""
+    return _TOKEN_RE.findall(text.lower().replace("ё", "е"))
+
+
+# ====================== BM25 ======================
+
+class BM25Index:
+    """
+    Инвертированный индекс в памяти: слово -> (номера документов, частоты слова в них).
+    Поиск проходит только по спискам слов запроса, а не по всем документам.
+    """
+    def __init__(self, texts: Sequence[str], k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        postings = defaultdict(lambda: ([], []))
+        lengths = []
+        for doc, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                docs, tfs = postings[term]
+                docs.append(doc)
+                tfs.append(tf)
+
+        self.size = len(lengths)
+        self.lengths = np.array(lengths, dtype=np.float32)
+        avg_length = float(self.lengths.mean()) if self.size else 0.0
+        # Нормировка по длине документа считается один раз для всех слов
+        self._length_norm = k1 * (1 - b + b * self.lengths / max(avg_length, 1e-9))
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray, float]] = {}
+        for term, (docs, tfs) in postings.items():
+            idf = math.log(1 + (self.size - len(docs) + 0.5) / (len(docs) + 0.5))
+            self.postings[term] = (np.array(docs, dtype=np.int64), np.array(tfs, dtype=np.float32), idf)
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """(номер документа, балл BM25), лучшие первыми; документы без общих слов не возвращаются."""
+        scores = np.zeros(self.size, dtype=np.float32)
+        matched = False
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            docs, tfs, idf = posting
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + self._length_norm[docs])
+            matched = True
+        if not matched:
+            return []
+        k = min(k, int(np.count_nonzero(scores)))
+        top = np.argpartition(-scores, k - 1)[:k] if k < self.size else np.arange(self.size)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(doc), float(scores[doc])) for doc in top if scores[doc] > 0]
+
+
+# ====================== СЛИЯНИЕ И ПЕРЕРАНЖИРОВАНИЕ ======================
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = RRF_K) -> List[Tuple[int, float]]:
+    """Слияние нескольких ранжированных списков: сумма 1 / (k + позиция) по всем спискам."""
+    scores: Dict[int, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            scores[doc] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class CrossEncoderReranker:
+    """Локальный cross-encoder (sentence-transformers): оценивает пары (вопрос, чанк) целиком."""
+    def __init__(self, model_name: str = RERANKER_MODEL, batch_size: int = 32):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = None
+
+    def scores(self, question: str, texts: Sequence[str]) -> np.ndarray:
+        if self._model is None:
+            # Импорт здесь: модель нужна, только если переранжирование включено
+            from sentence_transformers import CrossEncoder
+            self._model = CrossEncoder(self.model_name)
+        return np.asarray(
+            self._model.predict([(question, text) for text in texts], batch_size=self.batch_size)
+        )
+
+
+# ====================== ГИБРИДНЫЙ ПОИСК ======================
+
+class HybridRetriever:
+    """
+    BM25 + FAISS поверх LangChain FAISS из document_index.py.
+    mode: "hybrid" (по умолчанию), "dense" или "bm25" — последние два для сравнения в бенчмарке.
+    Интерфейс тот же, что у поиска в DocumentQAEngine: retrieve / retrieve_batch.
+    """
+    MODES = ("hybrid", "dense", "bm25")
+
+    def __init__(self, vectorstore: Any, mode: str = "hybrid", candidates: int = CANDIDATES,
+                 rrf_k: int = RRF_K, reranker: Optional[CrossEncoderReranker] = None):
+        if mode not in self.MODES:
+            raise ValueError(f"mode должен быть одним из {self.MODES}")
+        self.vectorstore = vectorstore
+        self.mode = mode
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.reranker = reranker
+
+        # Чанки в порядке id векторов: номер в этом списке — общий номер документа для BM25 и FAISS
+        self.vector_ids = sorted(vectorstore.index_to_docstore_id)
+        self.docs: List[Document] = [
+            vectorstore.docstore.search(vectorstore.index_to_docstore_id[vector_id]) for vector_id in self.vector_ids
+        ]
+        self._position = {vector_id: pos for pos, vector_id in enumerate(self.vector_ids)}
+        self.bm25 = BM25Index([doc.page_content for doc in self.docs])
+
+    # ---------------------- Поиск ----------------------
+
+    def _dense(self, vectors: np.ndarray, k: int) -> List[List[int]]:
+        """Плотный поиск для матрицы запросов одним вызовом FAISS."""
+        if not self.docs:
+            return [[] for _ in range(len(vectors))]
+        _, ids = self.vectorstore.index.search(vectors, min(k, len(self.docs)))
+        return [[self._position[int(i)] for i in row if i != -1] for row in ids]
+
+    def _embed(self, questions: Sequence[str]) -> np.ndarray:
+        return np.asarray(self.vectorstore.embedding_function.embed_documents(list(questions)), dtype=np.float32)
+
+    def _rank(self, question: str, dense: List[int], k: int) -> List[int]:
+        pool = max(k, self.candidates)
+        if self.mode == "dense":
+            ranking = dense
+        else:
+            lexical = [doc for doc, _ in self.bm25.search(question, pool)]
+            if self.mode == "bm25":
+                ranking = lexical
+            else:
+                ranking = [doc for doc, _ in reciprocal_rank_fusion([dense, lexical], self.rrf_k)]
+        if self.reranker is not None and ranking:
+            candidates = ranking[:pool]
+            scores = self.reranker.scores(question, [self.docs[doc].page_content for doc in candidates])
+            ranking = [candidates[i] for i in np.argsort(-scores, kind="stable")]
+        return ranking[:k]
+
+    def retrieve(self, question: str, k: int) -> List[Document]:
+        return self.retrieve_batch([question], k)[0]
+
+    def retrieve_batch(self, questions: Sequence[str], k: int) -> List[List[Document]]:
+        """Все вопросы кодируются одним вызовом, плотный поиск — один запрос к FAISS."""
+        if not questions:
+            return []
+        pool = max(k, self.candidates)
+        if self.mode == "bm25":
+            dense_rankings = [[] for _ in questions]
+        else:
+            dense_rankings = self._dense(self._embed(questions), pool)
+        return [
+            [self.docs[doc] for doc in self._rank(question, dense, k)]
+            for question, dense in zip(questions, dense_rankings)
+        ]
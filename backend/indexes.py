@@ -0,0 +1,305 @@
+import re
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+
+# ====================== НОРМАЛИЗАЦИЯ НАЗВАНИЙ ======================
+
+# Кавычки и скобки заменяем пробелами, «ё» приводим к «е»
+_NAME_FOLD_TABLE = str.maketrans({
+    "ё": "е",
+    "«": " ", "»": " ", "„": " ", "“": " ", "”": " ", '"': " ", "'": " ",
+    "(": " ", ")": " ", "[": " ", "]": " ", "{": " ", "}": " ",
+})
+
+
+def normalize_name(text: str) -> str:
+    """Приводит название к виду для поиска: нижний регистр, ё/е, без кавычек и скобок."""
+    return " ".join(text.lower().translate(_NAME_FOLD_TABLE).split())
+
+
+# ====================== ИНДЕКС ПО НАЗВАНИЮ ======================
+
+class NameIndex:
+    """
+    Индекс по полю 'Название', строится один раз на загрузку каталога.
+      - exact: нормализованное название -> позиции записей;
+      - grams: все подстроки длиной 1..GRAM_SIZE -> множество позиций записей.
+    Частичный запрос пересекает множества его n-грамм, начиная с самого короткого,
+    поэтому стоимость поиска зависит от числа совпадений, а не от размера каталога.
+    """
+    GRAM_SIZE = 3
+
+    def __init__(self, records: List[Dict[str, Any]], field: str = "Название"):
+        self.names = [normalize_name(item.get(field, "") or "") for item in records]
+
+        exact = defaultdict(list)
+        grams = defaultdict(set)
+        for pos, name in enumerate(self.names):
+            exact[name].append(pos)
+            for gram in self._grams(name, sizes=range(1, self.GRAM_SIZE + 1)):
+                grams[gram].add(pos)
+
+        self.exact: Dict[str, List[int]] = dict(exact)
+        self.grams: Dict[str, Set[int]] = dict(grams)
+
+    @staticmethod
+    def _grams(text: str, sizes) -> set:
+        return {text[i:i + n] for n in sizes for i in range(len(text) - n + 1)}
+
+    def find_exact(self, query: str) -> List[int]:
+        """Позиции записей, название которых совпадает с запросом после нормализации."""
+        return list(self.exact.get(normalize_name(query), []))
+
+    def find_partial(self, query: str) -> List[int]:
+        """Позиции записей, в названии которых запрос встречается как подстрока."""
+        norm = normalize_name(query)
+        if not norm:
+            return []
+        if len(norm) <= self.GRAM_SIZE:
+            return sorted(self.grams.get(norm, ()))
+
+        postings = []
+        for gram in self._grams(norm, sizes=(self.GRAM_SIZE,)):
+            posting = self.grams.get(gram)
+            if not posting:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+
+        smallest, rest = postings[0], postings[1:]
+        # n-граммы могут совпасть и без подстроки целиком, поэтому проверяем кандидатов
+        return sorted(
+            pos for pos in smallest
+            if all(pos in posting for posting in rest) and norm in self.names[pos]
+        )
+
+    def search(self, query: str) -> List[int]:
+        """Сначала точные совпадения названия, за ними остальные частичные (как поиск подстроки в baseline)."""
+        exact = self.find_exact(query)
+        seen = set(exact)
+        return exact + [pos for pos in self.find_partial(query) if pos not in seen]
+
+
+# ====================== НЕЧЁТКИЙ ПОИСК ПО НАЗВАНИЮ ======================
+
+def bounded_edit_distance(a: str, b: str, max_dist: int) -> int:
+    """
+    Расстояние Левенштейна, посчитанное только в полосе шириной max_dist вокруг диагонали.
+    Если оно больше max_dist, досрочно возвращает max_dist + 1.
+    """
+    len_a, len_b = len(a), len(b)
+    over = max_dist + 1
+    if abs(len_a - len_b) > max_dist:
+        return over
+    if a == b:
+        return 0
+
+    prev = [j if j <= max_dist else over for j in range(len_b + 1)]
+    for i in range(1, len_a + 1):
+        ca = a[i - 1]
+        cur = [over] * (len_b + 1)
+        cur[0] = row_min = i if i <= max_dist else over
+        for j in range(max(1, i - max_dist), min(len_b, i + max_dist) + 1):
+            value = prev[j - 1] + (ca != b[j - 1])
+            if prev[j] + 1 < value:
+                value = prev[j] + 1
+            if cur[j - 1] + 1 < value:
+                value = cur[j - 1] + 1
+            cur[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_dist:
+            return over
+        prev = cur
+    return min(prev[len_b], over)
+
+
+class FuzzyNameMatcher:
+    """
+    Поиск названий с опечатками ('Эрл грэй' -> 'Эрл Грей') поверх NameIndex:
+    кандидаты отбираются по числу общих триграмм, затем для лучших из них
+    считается ограниченное расстояние Левенштейна — до всего названия
+    и до каждого отрезка названия из стольких же слов, сколько в запросе.
+    """
+    MAX_CANDIDATES = 20
+
+    def __init__(self, name_index: NameIndex):
+        self.name_index = name_index
+        # Дефис считаем пробелом: 'Коста-Рика' и 'Коста Рика', 'Иван-чай' и 'Иван чай'
+        self.names = [name.replace("-", " ") for name in name_index.names]
+        self.words = [name.split() for name in self.names]
+
+    def _score(self, query: str, pos: int) -> float:
+        name = self.names[pos]
+        words = self.words[pos]
+        size = len(query.split())
+        variants = {name}
+        variants.update(" ".join(words[i:i + size]) for i in range(len(words) - size + 1))
+
+        # Допускаем примерно одну ошибку на каждые четыре символа запроса
+        max_dist = max(1, len(query) // 4)
+        best = 0.0
+        for variant in variants:
+            dist = bounded_edit_distance(query, variant, max_dist)
+            if dist <= max_dist:
+                best = max(best, 1 - dist / max(len(query), len(variant)))
+        return best
+
+    def search(self, query: str, k: int = 3, min_score: float = 0.7) -> List[Tuple[int, float]]:
+        """До k ближайших названий в виде (позиция, оценка от 0 до 1), лучшие первыми."""
+        norm = normalize_name(query)
+        size = NameIndex.GRAM_SIZE
+        if len(norm) < size:
+            return []
+
+        grams = {norm[i:i + size] for i in range(len(norm) - size + 1)}
+        overlap = Counter()
+        for gram in grams:
+            overlap.update(self.name_index.grams.get(gram, ()))
+
+        # Каждая правка портит не больше size триграмм: у кандидата на расстоянии
+        # max_dist должно остаться хотя бы len(grams) - size * max_dist общих триграмм
+        min_overlap = len(grams) - size * max(1, len(norm) // 4)
+        query = " ".join(norm.replace("-", " ").split())
+        scored = []
+        for pos, common in overlap.most_common(self.MAX_CANDIDATES):
+            if common < min_overlap:
+                break
+            score = self._score(query, pos)
+            if score >= min_score:
+                scored.append((pos, score))
+        scored.sort(key=lambda hit: (-hit[1], hit[0]))
+        return scored[:k]
+
+
+# Заголовок перед результатами нечёткого поиска, чтобы агент понимал, что название исправлено
+FUZZY_RESULTS_HEADER = "Точного совпадения нет, ближайшие по названию товары:"
+
+
+def search_by_name(catalog, query: str, field: str) -> Tuple[List[int], bool]:
+    """
+    Ищет товары по названию в поле field: точное/частичное совпадение по NameIndex,
+    а если ничего нет — нечёткий поиск (опечатки) по FuzzyNameMatcher.
+    catalog — снимок из catalog.CatalogStore, индексы строятся раз на его загрузку.
+    Возвращает (позиции записей, был ли поиск нечётким).
+    """
+    name_index = catalog.index(f"name:{field}", lambda records: NameIndex(records, field=field))
+    positions = name_index.search(query)
+    if positions:
+        return positions, False
+
+    fuzzy = catalog.index(f"fuzzy:{field}", lambda records: FuzzyNameMatcher(name_index))
+    return [pos for pos, _ in fuzzy.search(query)], True
+
+
+# ====================== ИНВЕРТИРОВАННЫЙ ИНДЕКС ПО ВКУСУ ======================
+
+def split_tastes(text: str) -> List[str]:
+    """'Черный, цитрусовый, «ароматный»' -> ['черный', 'цитрусовый', 'ароматный']."""
+    return [taste for taste in (normalize_name(part) for part in text.split(",")) if taste]
+
+
+class TasteIndex:
+    """
+    Инвертированный индекс по полю 'Вкус' (вкусы перечислены через запятую):
+    вкус -> множество позиций товаров. Строится один раз на загрузку каталога.
+    """
+    def __init__(self, records: List[Dict[str, Any]], field: str = "Вкус"):
+        postings = defaultdict(set)
+        for pos, item in enumerate(records):
+            for taste in split_tastes(item.get(field) or ""):
+                postings[taste].add(pos)
+
+        self.postings: Dict[str, Set[int]] = dict(postings)
+        # Отсортированный словарь вкусов для запросов по началу слова ('черн', 'цитрус')
+        self.tastes: List[str] = sorted(self.postings)
+
+    def _lookup(self, taste: str) -> Set[int]:
+        posting = self.postings.get(taste)
+        if posting is not None:
+            return posting
+
+        # Точного вкуса нет — объединяем все вкусы, начинающиеся с запроса
+        found = set()
+        for i in range(bisect_left(self.tastes, taste), len(self.tastes)):
+            if not self.tastes[i].startswith(taste):
+                break
+            found |= self.postings[self.tastes[i]]
+        return found
+
+    def search(self, query: str) -> List[Tuple[int, int]]:
+        """
+        Товары, у которых есть хотя бы один вкус из запроса, в виде (позиция, число совпавших вкусов).
+        Сначала идут товары с наибольшим числом совпадений (пересечение всех вкусов запроса).
+        """
+        overlap = Counter()
+        for taste in dict.fromkeys(split_tastes(query)):
+            overlap.update(self._lookup(taste))
+        return sorted(overlap.items(), key=lambda hit: (-hit[1], hit[0]))
+
+# ====================== ИНДЕКС ПО НОМЕРУ ЗАКАЗА ======================
+
+# Пользователи часто набирают префикс кириллицей: «ТСН» -> «TCH»
+_ORDER_FOLD_TABLE = str.maketrans({"Т": "T", "С": "C", "Н": "H"})
+# Сначала ищем номер после префикса TCH (в том числе неполный: 'TCH-2502' — заказы за месяц)
+_ORDER_NUMBER_RE = re.compile(r"TCH[\s-]*(\d{1,6})(?:[\s-]*(\d{2})(?!\d))?")
+# Без префикса номером считаем только отдельное число из 6 цифр (YYMMDD) и, возможно, ещё 2 (NN),
+# чтобы '5' из 'Заказ номер 5' или '2' из 'в 2 часа' не принимались за номер
+_BARE_ORDER_NUMBER_RE = re.compile(r"(?<!\d)(\d{6})(?:[\s-]*(\d{2}))?(?!\d)")
+
+
+def normalize_order_number(text: str) -> str:
+    """
+    Приводит номер заказа формата TCH-YYMMDD-NN к строке из цифр:
+    'TCH-250211-02', 'тсн 250211 02.' и '25021102' -> '25021102', 'TCH-250211' -> '250211',
+    'Заказ номер 5, TCH-250211-02' -> '25021102'.
+    """
+    text = text.upper().translate(_ORDER_FOLD_TABLE)
+    match = _ORDER_NUMBER_RE.search(text) or _BARE_ORDER_NUMBER_RE.search(text)
+    if not match:
+        return ""
+    return "".join(group for group in match.groups() if group)
+
+
+class OrderIndex:
+    """
+    Индекс по полю 'Номер заказа', строится один раз на загрузку каталога.
+      - by_number: нормализованный номер -> позиции записей (точный поиск за O(1));
+      - numbers: отсортированные номера для поиска по префиксу бинарным поиском,
+        например 'TCH-250211' (все заказы за день) или 'TCH-2502' (за месяц).
+    """
+    def __init__(self, records: List[Dict[str, Any]], field: str = "Номер заказа"):
+        by_number = defaultdict(list)
+        for pos, item in enumerate(records):
+            number = normalize_order_number(item.get(field, "") or "")
+            if number:
+                by_number[number].append(pos)
+
+        self.by_number: Dict[str, List[int]] = dict(by_number)
+        self.numbers: List[str] = sorted(self.by_number)
+
+    def find_exact(self, query: str) -> List[int]:
+        """Позиции заказов с точно таким номером."""
+        return list(self.by_number.get(normalize_order_number(query), []))
+
+    def find_prefix(self, query: str, limit: Optional[int] = None) -> List[int]:
+        """Позиции заказов, номер которых начинается с запроса (не больше limit номеров)."""
+        prefix = normalize_order_number(query)
+        if not prefix:
+            return []
+
+        positions = []
+        start = bisect_left(self.numbers, prefix)
+        end = len(self.numbers) if limit is None else min(len(self.numbers), start + limit)
+        for i in range(start, end):
+            number = self.numbers[i]
+            if not number.startswith(prefix):
+                break
+            positions.extend(self.by_number[number])
+        return sorted(positions)
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[int]:
+        """Сначала точный номер, если его нет — все номера с таким префиксом."""
+        return self.find_exact(query) or self.find_prefix(query, limit)
@@ -0,0 +1,148 @@
+import os
+import json
+import sqlite3
+import sys
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from catalog import catalog_store
+from indexes import OrderIndex, normalize_order_number
+
+# Найденный заказ: (номер записи для "[doc N]", запись с русскими ключами как в orders.json)
+OrderHit = Tuple[int, Dict[str, Any]]
+
+
+# ====================== ИНТЕРФЕЙС ХРАНИЛИЩА ЗАКАЗОВ ======================
+
+class OrderBackend:
+    """
+    Хранилище заказов для json_order_search.
+    find() сначала ищет точный номер заказа, если его нет — все номера с таким префиксом.
+    """
+    def find(self, query: str, limit: Optional[int] = None) -> List[OrderHit]:
+        raise NotImplementedError
+
+    def size(self) -> Optional[int]:
+        """Число заказов, если оно известно без отдельного запроса (для метрик); иначе None."""
+        return None
+
+
+class JSONOrderBackend(OrderBackend):
+    """Заказы из orders.json через общее хранилище каталогов и индекс OrderIndex."""
+    def __init__(self, json_path: str):
+        self.json_path = json_path
+
+    def find(self, query: str, limit: Optional[int] = None) -> List[OrderHit]:
+        catalog = catalog_store.get(self.json_path)
+        order_index = catalog.index("order_number", OrderIndex)
+        return [(pos + 1, catalog.records[pos]) for pos in order_index.search(query, limit)]
+
+    def size(self) -> Optional[int]:
+        return len(catalog_store.get(self.json_path))
+
+
+# ====================== SQLITE ======================
+
+# Соответствие колонок таблицы ключам orders.json
+ORDER_COLUMNS = {
+    "number": "Номер заказа",
+    "items": "Состав заказа",
+    "created_date": "Дата формирования заказа",
+    "delivery_status": "Статус доставки",
+    "delivery_date": "Дата доставки",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY,
+    number_key TEXT NOT NULL,
+    number TEXT NOT NULL,
+    items TEXT,
+    created_date TEXT,
+    delivery_status TEXT,
+    delivery_date TEXT
+);
+CREATE INDEX IF NOT EXISTS orders_number_key ON orders (number_key);
+CREATE INDEX IF NOT EXISTS orders_created_date ON orders (created_date);
+CREATE INDEX IF NOT EXISTS orders_delivery_status ON orders (delivery_status);
+CREATE INDEX IF NOT EXISTS orders_delivery_date ON orders (delivery_date);
+"""
+
+
+class SQLiteOrderBackend(OrderBackend):
+    """
+    Заказы в SQLite: в памяти процесса ничего не держится, поиск идёт по индексам.
+    number_key — номер заказа из одних цифр (см. normalize_order_number),
+    поэтому префикс 'TCH-250211' превращается в диапазон ['250211', '250211:').
+    """
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        # sqlite3-соединение нельзя делить между потоками Flask, держим своё на поток
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _to_hit(row: sqlite3.Row) -> OrderHit:
+        return row["id"], {key: row[column] for column, key in ORDER_COLUMNS.items()}
+
+    def find(self, query: str, limit: Optional[int] = None) -> List[OrderHit]:
+        number_key = normalize_order_number(query)
+        if not number_key:
+            return []
+        conn = self._connection()
+
+        rows = conn.execute(
+            "SELECT * FROM orders WHERE number_key = ? ORDER BY id", (number_key,)
+        ).fetchall()
+        if not rows:
+            # ':' идёт в ASCII сразу после '9', так что это все ключи с данным префиксом
+            rows = conn.execute(
+                "SELECT * FROM orders WHERE number_key >= ? AND number_key < ? "
+                "ORDER BY number_key, id LIMIT ?",
+                (number_key, number_key + ":", -1 if limit is None else limit),
+            ).fetchall()
+            rows.sort(key=lambda row: row["id"])
+        return [self._to_hit(row) for row in rows]
+
+    def size(self) -> Optional[int]:
+        return self._connection().execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+
+
+def import_orders_from_json(json_path: str, db_path: str) -> int:
+    """Переносит orders.json в SQLite (таблица заказов перезаписывается). Возвращает число заказов."""
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+
+    rows = []
+    for idx, item in enumerate(data, start=1):
+        number = item.get("Номер заказа", "") or ""
+        rows.append((idx, normalize_order_number(number), number) + tuple(
+            item.get(key, "") for column, key in ORDER_COLUMNS.items() if column != "number"
+        ))
+
+    with sqlite3.connect(db_path) as conn:
+        conn.executescript(_SCHEMA)
+        conn.execute("DELETE FROM orders")
+        conn.executemany(
+            "INSERT INTO orders (id, number_key, number, items, created_date, delivery_status, delivery_date) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+    conn.close()
+    return len(rows)
+
+
+if __name__ == "__main__":
+    # Пример: python backend/order_store.py orders.json orders.db
+    source = sys.argv[1] if len(sys.argv) > 1 else "orders.json"
+    target = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(source)[0] + ".db"
+    count = import_orders_from_json(source, target)
+    print(f"Импортировано заказов: {count} -> {target}")
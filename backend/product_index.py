@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+from answer_cache import DEFAULT_EMBEDDING_MODEL
+from indexes import normalize_name
+
+# Семантический индекс товаров для рекомендаций по вкусу: эмбеддинги "Описание" + "Вкус" в FAISS.
+# Индекс хранится на диске рядом с каталогом (.product_index/) вместе с манифестом:
+# ключ товара -> (id вектора в FAISS, sha1 текста). При изменении tea_data.json заново
+# кодируются только новые и изменившиеся товары, удалённые убираются из индекса.
+# Ручная пересборка из корня проекта:
+#   python backend/product_index.py tea_data.json
+
+PRODUCT_INDEX_DIRNAME = ".product_index"
+INDEX_FILENAME = "products.faiss"
+MANIFEST_FILENAME = "manifest.json"
+DEFAULT_TOP_K = 5
+BATCH_SIZE = 64
+
+
+def product_text(item: Dict[str, Any]) -> str:
+    """Текст товара для эмбеддинга: описание и перечень вкусов."""
+    description = (item.get("Описание") or "").strip()
+    taste = (item.get("Вкус") or "").strip()
+    return f"{description}\nВкус: {taste}" if taste else description
+
+
+def _text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def product_keys(records: Sequence[Dict[str, Any]]) -> List[str]:
+    """Устойчивые ключи товаров: нормализованное название, повторы получают суффикс #2, #3..."""
+    seen: Dict[str, int] = {}
+    keys = []
+    for item in records:
+        key = normalize_name(item.get("Название", "") or "")
+        seen[key] = seen.get(key, 0) + 1
+        keys.append(key if seen[key] == 1 else f"{key}#{seen[key]}")
+    return keys
+
+
+# ====================== СНИМОК ДЛЯ ПОИСКА ======================
+
+class SemanticProductSearch:
+    """
+    Неизменяемый снимок индекса для одной загрузки каталога:
+    FAISS-индекс и соответствие id вектора -> позиция записи в catalog.records.
+    """
+    def __init__(self, index: Any, positions: Dict[int, int], encode: Callable[[List[str]], np.ndarray]):
+        self.index = index
+        self.positions = positions
+        self._encode = encode
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def search(self, query: str, k: int = DEFAULT_TOP_K) -> List[Tuple[int, float]]:
+        """Список (позиция записи, косинусное сходство), самые близкие первыми."""
+        if not query.strip() or not self.positions:
+            return []
+        vector = self._encode([query])
+        scores, ids = self.index.search(vector, min(k, len(self.positions)))
+        return [
+            (self.positions[int(vector_id)], float(score))
+            for vector_id, score in zip(ids[0], scores[0])
+            if int(vector_id) in self.positions
+        ]
+
+
+# ====================== ХРАНИЛИЩЕ ИНДЕКСА НА ДИСКЕ ======================
+
+class ProductEmbeddingIndex:
+    """
+    FAISS-индекс (IndexIDMap2 поверх IndexFlatIP, векторы нормированы — скалярное произведение
+    равно косинусу) с манифестом на диске.
+    sync(records) приводит индекс в соответствие с каталогом и возвращает SemanticProductSearch;
+    её удобно передавать в catalog.index(...) — тогда синхронизация идёт один раз на загрузку файла.
+    """
+    def __init__(
+        self,
+        index_dir: Optional[str],
+        model_name: str = DEFAULT_EMBEDDING_MODEL,
+        encoder: Optional[Callable[[List[str]], np.ndarray]] = None,
+        batch_size: int = BATCH_SIZE,
+    ):
+        self.index_dir = index_dir
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._encoder = encoder
+        self._lock = threading.Lock()
+        # Последняя синхронизация: сколько товаров добавлено, обновлено и удалено
+        self.last_sync: Dict[str, int] = {}
+
+    @classmethod
+    def for_catalog(cls, json_path: str, **kwargs) -> "ProductEmbeddingIndex":
+        """Индекс в каталоге .product_index/ рядом с JSON-файлом товаров."""
+        directory = os.path.dirname(os.path.abspath(json_path))
+        return cls(os.path.join(directory, PRODUCT_INDEX_DIRNAME), **kwargs)
+
+    # ---------------------- Эмбеддинги ----------------------
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if self._encoder is None:
+            # Импорт здесь: модель грузится при первой синхронизации или первом запросе
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(self.model_name)
+            self._encoder = lambda batch: model.encode(
+                batch, batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True
+            )
+        vectors = np.asarray(self._encoder(texts), dtype=np.float32)
+        # Нормируем на случай стороннего encoder'а
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return np.ascontiguousarray(vectors / np.maximum(norms, 1e-12))
+
+    # ---------------------- Файлы ----------------------
+
+    def _paths(self) -> Tuple[str, str]:
+        return (
+            os.path.join(self.index_dir, INDEX_FILENAME),
+            os.path.join(self.index_dir, MANIFEST_FILENAME),
+        )
+
+    def _load(self) -> Tuple[Optional[Any], Dict[str, Any]]:
+        """Индекс и манифест с диска; при другой модели или битых файлах — пустые."""
+        empty = {"model": self.model_name, "next_id": 0, "products": {}}
+        if not self.index_dir:
+            return None, empty
+        index_path, manifest_path = self._paths()
+        if not (os.path.exists(index_path) and os.path.exists(manifest_path)):
+            return None, empty
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            index = faiss.read_index(index_path)
+        except (OSError, ValueError, RuntimeError):
+            return None, empty
+        if manifest.get("model") != self.model_name or index.ntotal != len(manifest.get("products", {})):
+            return None, empty
+        return index, manifest
+
+    def _save(self, index: Any, manifest: Dict[str, Any]) -> None:
+        if not self.index_dir:
+            return
+        os.makedirs(self.index_dir, exist_ok=True)
+        index_path, manifest_path = self._paths()
+        # Сначала индекс, потом манифест: манифест без своего индекса при загрузке отбрасывается
+        faiss.write_index(index, index_path + ".tmp")
+        os.replace(index_path + ".tmp", index_path)
+        with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+    # ---------------------- Синхронизация с каталогом ----------------------
+
+    def sync(self, records: List[Dict[str, Any]]) -> SemanticProductSearch:
+        """
+        Сверяет sha1 текстов товаров с манифестом: кодирует только новые и изменённые товары,
+        удаляет пропавшие и сохраняет индекс, если что-то поменялось.
+        """
+        with self._lock:
+            index, manifest = self._load()
+            products: Dict[str, Dict[str, Any]] = manifest["products"]
+            next_id = manifest["next_id"]
+
+            keys = product_keys(records)
+            texts = [product_text(item) for item in records]
+            hashes = [_text_hash(text) for text in texts]
+
+            stale_ids = []
+            to_encode = []  # (ключ, позиция записи)
+            for pos, (key, text_hash) in enumerate(zip(keys, hashes)):
+                entry = products.get(key)
+                if entry is not None and entry["hash"] == text_hash:
+                    continue
+                if entry is not None:
+                    stale_ids.append(entry["id"])
+                to_encode.append((key, pos))
+            current = set(keys)
+            removed = [key for key in products if key not in current]
+            stale_ids.extend(products[key]["id"] for key in removed)
+
+            if to_encode:
+                vectors = np.concatenate([
+                    self.encode([texts[pos] for _, pos in to_encode[i:i + self.batch_size]])
+                    for i in range(0, len(to_encode), self.batch_size)
+                ])
+                if index is None:
+                    index = faiss.IndexIDMap2(faiss.IndexFlatIP(vectors.shape[1]))
+
+            if stale_ids and index is not None:
+                index.remove_ids(np.array(stale_ids, dtype=np.int64))
+            for key in removed:
+                del products[key]
+            if to_encode:
+                ids = np.arange(next_id, next_id + len(to_encode), dtype=np.int64)
+                index.add_with_ids(vectors, ids)
+                for (key, pos), vector_id in zip(to_encode, ids.tolist()):
+                    products[key] = {"id": vector_id, "hash": hashes[pos]}
+                next_id += len(to_encode)
+
+            self.last_sync = {
+                "added": len(to_encode) - (len(stale_ids) - len(removed)),
+                "updated": len(stale_ids) - len(removed),
+                "removed": len(removed),
+            }
+            if index is not None and (to_encode or removed):
+                manifest.update({"model": self.model_name, "next_id": next_id, "products": products})
+                self._save(index, manifest)
+
+            # Пустой каталог без сохранённого индекса: index остаётся None, поиск вернёт пустой список
+            positions = {products[key]["id"]: pos for pos, key in enumerate(keys)}
+            return SemanticProductSearch(index, positions, self.encode)
+
+
+if __name__ == "__main__":
+    import sys
+    from catalog import catalog_store
+
+    json_path = sys.argv[1] if len(sys.argv) > 1 else "tea_data.json"
+    store = ProductEmbeddingIndex.for_catalog(json_path)
+    search = store.sync(catalog_store.records(json_path))
+    print(f"Товаров в индексе: {len(search)}; изменения: {store.last_sync}; индекс: {store.index_dir}")
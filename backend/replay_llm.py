@@ -0,0 +1,362 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# Строка промпта, после которой идёт вопрос (см. instruction.txt)
+QUESTION_PREFIX = "Вопрос пользователя:"
+OBSERVATION_MARKER = "\nObservation:"
+DEFAULT_COMPLETION = "Final Answer: К сожалению, я не нашёл подходящего ответа."
+
+_WORD_RE = re.compile(r"\S+\s*|\s+")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().replace("ё", "е").split())
+
+
+def prompt_text(messages: List[BaseMessage]) -> str:
+    return "\n".join(f"{message.type}: {message.content}" for message in messages)
+
+
+def prompt_key(messages: List[BaseMessage]) -> str:
+    """Ключ точного совпадения промпта для записанного трафика."""
+    return hashlib.sha1(prompt_text(messages).encode("utf-8")).hexdigest()
+
+
+def parse_prompt(messages: List[BaseMessage]):
+    """Вопрос пользователя и номер шага ReAct-цикла (сколько Observation уже в scratchpad)."""
+    text = prompt_text(messages)
+    idx = text.rfind(QUESTION_PREFIX)
+    if idx == -1:
+        return "", 0
+    tail = text[idx + len(QUESTION_PREFIX):]
+    question, _, scratchpad = tail.partition("\n")
+    return question.strip(), scratchpad.count(OBSERVATION_MARKER)
+
+
+# ====================== ЗАПИСИ (CASSETTE) ======================
+
+class ReplayCassette:
+    """
+    Что отвечать вместо GigaChat:
+      - exact: точный промпт (sha1) -> ответ модели; пишется в режиме записи;
+      - traces: сценарии ReAct — ответы модели по шагам. У сценария есть question
+        (точный вопрос) или key (вход первого Action, например название товара или номер заказа):
+        сценарий выбирается, если key встречается в вопросе; из нескольких — самый длинный key.
+    """
+    def __init__(self, exact: Optional[Dict[str, str]] = None, traces: Optional[List[Dict[str, Any]]] = None,
+                 default_completion: str = DEFAULT_COMPLETION):
+        self.exact = dict(exact or {})
+        self.traces: List[Dict[str, Any]] = []
+        self.default_completion = default_completion
+        self._by_question: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        for trace in traces or []:
+            self.add_trace(trace.get("steps", []), question=trace.get("question"), key=trace.get("key"))
+
+    def add_trace(self, steps: List[str], question: Optional[str] = None, key: Optional[str] = None) -> Dict[str, Any]:
+        trace = {"question": question, "key": key, "steps": list(steps)}
+        with self._lock:
+            self.traces.append(trace)
+            if question:
+                self._by_question[_normalize(question)] = trace
+        return trace
+
+    def _find_trace(self, question: str) -> Optional[Dict[str, Any]]:
+        normalized = _normalize(question)
+        trace = self._by_question.get(normalized)
+        if trace is not None:
+            return trace
+        best: List[Dict[str, Any]] = []
+        best_len = 0
+        for candidate in self.traces:
+            key = _normalize(candidate.get("key") or "")
+            if not key or key not in normalized:
+                continue
+            if len(key) > best_len:
+                best, best_len = [candidate], len(key)
+            elif len(key) == best_len:
+                best.append(candidate)
+        if not best:
+            return None
+        # Одинаковые ключи (один товар в нескольких прогонах): выбор зависит от вопроса, но не случаен
+        digest = int(hashlib.sha1(normalized.encode("utf-8")).hexdigest(), 16)
+        return best[digest % len(best)]
+
+    def lookup(self, messages: List[BaseMessage]) -> str:
+        completion = self.exact.get(prompt_key(messages))
+        if completion is not None:
+            return completion
+        question, step = parse_prompt(messages)
+        trace = self._find_trace(question) if question else None
+        if trace is None or not trace["steps"]:
+            return self.default_completion
+        return trace["steps"][min(step, len(trace["steps"]) - 1)]
+
+    def record(self, messages: List[BaseMessage], completion: str) -> None:
+        question, step = parse_prompt(messages)
+        with self._lock:
+            self.exact[prompt_key(messages)] = completion
+            if not question:
+                return
+            trace = self._by_question.get(_normalize(question))
+            if trace is None:
+                trace = {"question": question, "key": None, "steps": []}
+                self.traces.append(trace)
+                self._by_question[_normalize(question)] = trace
+            steps = trace["steps"]
+            if step < len(steps):
+                steps[step] = completion
+            else:
+                steps.append(completion)
+
+    # ---------------------- Файл ----------------------
+
+    @classmethod
+    def load(cls, path: str) -> "ReplayCassette":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            exact=data.get("exact"),
+            traces=data.get("traces"),
+            default_completion=data.get("default_completion", DEFAULT_COMPLETION),
+        )
+
+    def save(self, path: str) -> None:
+        with self._lock:
+            data = {
+                "version": 1,
+                "default_completion": self.default_completion,
+                "exact": self.exact,
+                "traces": self.traces,
+            }
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+
+
+# ====================== ИЗВЛЕЧЕНИЕ СЦЕНАРИЕВ ИЗ ЛОГОВ ======================
+
+_CHAIN_START = "> Entering new AgentExecutor chain..."
+_CHAIN_END = "> Finished chain."
+_TOOL_CALL_RE = re.compile(r"\[DEBUG\] Tool '(?P<tool>[^']+)' called with input: (?P<input>[^\n]*)\n")
+_TOOL_OUTPUT_RE = re.compile(r"\[DEBUG\] Tool '[^']+' output: ")
+_ACTION_INPUT_RE = re.compile(r"Action Input:\s*(?P<input>[^\n\[]+)")
+
+
+def _split_observation(rest: str):
+    """
+    В логе verbose=True результат инструмента напечатан дважды: в [DEBUG]-строке и как Observation,
+    сразу за которым без разделителя идёт следующий ответ модели. Возвращает (observation, остаток).
+    """
+    for idx in [i for i, ch in enumerate(rest) if ch == "\n"]:
+        observation = rest[:idx]
+        if rest.startswith(observation, idx + 1):
+            return observation, rest[idx + 1 + len(observation):]
+    return rest, ""
+
+
+def mine_debug_log(path: str) -> List[Dict[str, Any]]:
+    """
+    Сценарии из логов прогона агента (backend/responses/*_debug.txt): для каждой цепочки —
+    ответы модели по шагам; key — вход первого Action.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    traces = []
+    for block in text.split(_CHAIN_START)[1:]:
+        block = block.split(_CHAIN_END, 1)[0].strip("\n")
+        steps = []
+        while True:
+            call = _TOOL_CALL_RE.search(block)
+            if call is None:
+                steps.append(block.strip())
+                break
+            steps.append(block[:call.start()].strip())
+            output = _TOOL_OUTPUT_RE.search(block, call.end())
+            if output is None:
+                break
+            _, block = _split_observation(block[output.end():])
+        steps = [step for step in steps if step]
+        if not steps:
+            continue
+        action_input = _ACTION_INPUT_RE.search(steps[0])
+        key = action_input.group("input").strip(" \"'") if action_input else None
+        if key and "," in key:
+            # 'Эрл Грей, Цена' — ключом служит название
+            key = key.split(",", 1)[0].strip()
+        traces.append({"question": None, "key": key, "steps": steps})
+    return traces
+
+
+# ====================== МОДЕЛИ ======================
+
+def _truncate_at_stop(text: str, stop: Optional[List[str]]) -> str:
+    for token in stop or []:
+        idx = text.find(token)
+        if idx != -1:
+            text = text[:idx]
+    return text
+
+
+def _usage(messages: List[BaseMessage], text: str) -> Dict[str, int]:
+    # Примерная оценка токенов по словам — чтобы счётчики /metrics работали и на записях
+    input_tokens = len(prompt_text(messages).split())
+    output_tokens = len(text.split())
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+
+class ReplayChatModel(BaseChatModel):
+    """
+    Замена GigaChat для замеров и регрессионных прогонов без сети:
+    отвечает из ReplayCassette с искусственной задержкой.
+      - latency — задержка до первого токена (секунды), latency_jitter — случайная добавка к ней;
+      - token_latency — пауза между словами при потоковой выдаче (/bot/stream).
+    """
+    cassette: Any
+    latency: float = 0.0
+    latency_jitter: float = 0.0
+    token_latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay-chat-model"
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "ReplayChatModel":
+        return cls(cassette=ReplayCassette.load(path), **kwargs)
+
+    def _delay(self) -> float:
+        return self.latency + (random.random() * self.latency_jitter if self.latency_jitter else 0.0)
+
+    def _completion(self, messages: List[BaseMessage], stop: Optional[List[str]]) -> str:
+        return _truncate_at_stop(self.cassette.lookup(messages), stop)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        text = self._completion(messages, stop)
+        time.sleep(self._delay() + self.token_latency * len(text.split()))
+        message = AIMessage(content=text, usage_metadata=_usage(messages, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        text = self._completion(messages, stop)
+        await asyncio.sleep(self._delay() + self.token_latency * len(text.split()))
+        message = AIMessage(content=text, usage_metadata=_usage(messages, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        text = self._completion(messages, stop)
+        time.sleep(self._delay())
+        pieces = _WORD_RE.findall(text)
+        for i, piece in enumerate(pieces):
+            if i and self.token_latency:
+                time.sleep(self.token_latency)
+            last = i == len(pieces) - 1
+            chunk = ChatGenerationChunk(message=AIMessageChunk(
+                content=piece, usage_metadata=_usage(messages, text) if last else None,
+            ))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        text = self._completion(messages, stop)
+        await asyncio.sleep(self._delay())
+        pieces = _WORD_RE.findall(text)
+        for i, piece in enumerate(pieces):
+            if i and self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            last = i == len(pieces) - 1
+            chunk = ChatGenerationChunk(message=AIMessageChunk(
+                content=piece, usage_metadata=_usage(messages, text) if last else None,
+            ))
+            if run_manager:
+                await run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+
+class RecordingChatModel(BaseChatModel):
+    """
+    Проксирует вызовы в настоящую модель (inner) и записывает каждый ответ в cassette,
+    после каждого вызова сохраняя её в path. Потом path можно проиграть через ReplayChatModel.
+    """
+    inner: Any
+    cassette: Any
+    path: str
+
+    @property
+    def _llm_type(self) -> str:
+        return "recording-chat-model"
+
+    def _save(self, messages: List[BaseMessage], message: BaseMessage) -> None:
+        self.cassette.record(messages, message.content)
+        self.cassette.save(self.path)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        message = self.inner.invoke(messages, stop=stop, **kwargs)
+        self._save(messages, message)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        message = await self.inner.ainvoke(messages, stop=stop, **kwargs)
+        await asyncio.to_thread(self._save, messages, message)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+# ====================== ВЫБОР МОДЕЛИ ПО ОКРУЖЕНИЮ ======================
+
+def llm_from_env(live_factory: Callable[[], BaseChatModel]) -> BaseChatModel:
+    """
+    BOT_LLM_REPLAY=<файл> — отвечать из записей (задержки: BOT_LLM_LATENCY, BOT_LLM_TOKEN_LATENCY, секунды);
+    BOT_LLM_RECORD=<файл> — ходить в GigaChat и дописывать ответы в файл;
+    иначе — настоящая модель live_factory().
+    """
+    replay_path = os.environ.get("BOT_LLM_REPLAY")
+    if replay_path:
+        return ReplayChatModel.from_file(
+            replay_path,
+            latency=float(os.environ.get("BOT_LLM_LATENCY", "0")),
+            token_latency=float(os.environ.get("BOT_LLM_TOKEN_LATENCY", "0")),
+        )
+    record_path = os.environ.get("BOT_LLM_RECORD")
+    if record_path:
+        cassette = ReplayCassette.load(record_path) if os.path.exists(record_path) else ReplayCassette()
+        return RecordingChatModel(inner=live_factory(), cassette=cassette, path=record_path)
+    return live_factory()
+
+
+if __name__ == "__main__":
+    # Сценарии из логов: python backend/replay_llm.py backend/responses/*_debug.txt replay.json
+    if len(sys.argv) < 3:
+        print("Использование: python backend/replay_llm.py <лог_debug.txt> [...] <cassette.json>")
+        sys.exit(1)
+    *log_paths, cassette_path = sys.argv[1:]
+    cassette = ReplayCassette.load(cassette_path) if os.path.exists(cassette_path) else ReplayCassette()
+    for log_path in log_paths:
+        traces = mine_debug_log(log_path)
+        for trace in traces:
+            cassette.add_trace(trace["steps"], key=trace["key"])
+        print(f"{log_path}: сценариев {len(traces)}")
+    cassette.save(cassette_path)
+    print(f"Сохранено в {cassette_path}: сценариев {len(cassette.traces)}, точных ответов {len(cassette.exact)}")
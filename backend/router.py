@@ -0,0 +1,189 @@
+import re
+from typing import List, Optional, Tuple
+
+from catalog import catalog_store
+from indexes import normalize_name, normalize_order_number, search_by_name
+from order_store import JSONOrderBackend, OrderBackend
+
+# ====================== ПРАВИЛА ДЛЯ ШАБЛОННЫХ ВОПРОСОВ ======================
+
+# Полный номер заказа TCH-YYMMDD-NN (префикс можно набрать кириллицей)
+ORDER_NUMBER_RE = re.compile(r"(?:TCH|ТСН)[\s-]*\d{6}[\s-]*\d{2}", re.IGNORECASE)
+
+# Что именно спрашивают про заказ; порядок важен: «статус доставки» — это статус, а не дата
+ORDER_ASPECTS = [
+    ("items", re.compile(r"состав|входит|включен|какие товары", re.IGNORECASE)),
+    ("created", re.compile(r"оформ|сформир|создан", re.IGNORECASE)),
+    ("status", re.compile(r"статус", re.IGNORECASE)),
+    ("delivery", re.compile(r"доставят|доставк|доставлен", re.IGNORECASE)),
+]
+
+# Просьбы что-то сделать с заказом (вернуть, повторить, ускорить) — это к агенту, а не справка
+ORDER_REQUEST_RE = re.compile(r"верну|возврат|отмени|повтор|быстрее|ускор|измени|перенес", re.IGNORECASE)
+
+# Вопросы о стоимости заказа или доставки («Стоимость доставки заказа ...») — тоже к агенту:
+# проверяются до ORDER_ASPECTS, иначе «доставк» уводит их в шаблонный ответ с датой доставки
+ORDER_COST_RE = re.compile(r"стоимост|\bцен|сколько\s+стоит|сумм", re.IGNORECASE)
+
+# Название товара в кавычках: «Эрл Грей», "Эрл Грей", “Эрл Грей”
+QUOTED_NAME_RE = re.compile(r"[«\"“](?P<name>[^«»\"“”]+)[»\"”]")
+
+SIMILAR_RE = re.compile(
+    r"похож|аналог|альтернатив|схож|вместо|если нравится",
+    re.IGNORECASE,
+)
+# Без кавычек название берём после ключевой фразы
+SIMILAR_NAME_RE = re.compile(
+    r"(?:похож\w*\s+на|аналог\w*\s+(?:для\s+)?|схож\w*\s+с|вместо|альтернатив\w*\s+(?:для\s+)?)"
+    r"\s*(?P<name>.+?)\s*(?:вы\s+можете.*|есть.*|у\s+вас.*|имеются.*)?[?.!]*$",
+    re.IGNORECASE,
+)
+
+PRICE_RE = re.compile(
+    r"(?:сколько\s+стоит|какова\s+цена|какая\s+цена|стоимость)\s+"
+    r"(?:у\s+|на\s+)?(?:товара?\s+)?(?P<name>.+?)\s*[?.!]*$",
+    re.IGNORECASE,
+)
+
+DESCRIPTION_RE = re.compile(
+    r"(?:опиши(?:те)?(?:\s+мне)?|дай(?:те)?\s+описание|"
+    r"расскажи(?:те)?,?(?:\s+пожалуйста,?)?\s+(?:описание|про|о))\s+"
+    r"(?:товара?\s+)?(?P<name>.+?)\s*[?.!]*$",
+    re.IGNORECASE,
+)
+
+
+class IntentRouter:
+    """
+    Быстрый путь перед ReAct-агентом: шаблонные вопросы про цену, описание,
+    заказ и похожие товары разбираются правилами и отвечаются прямо по индексам,
+    без вызовов GigaChat. route() возвращает None, если вопрос не распознан
+    или название товара неоднозначно — тогда вопрос уходит агенту.
+    """
+    def __init__(self, json_file_tea: str, order_backend: OrderBackend, json_file_similar: str):
+        self.json_file_tea = json_file_tea
+        self.order_backend = order_backend
+        self.json_file_similar = json_file_similar
+
+    def route(self, question: str) -> Optional[str]:
+        question = " ".join(question.split())
+
+        match = ORDER_NUMBER_RE.search(question)
+        if match:
+            return self._answer_order(question, match.group(0))
+
+        if SIMILAR_RE.search(question):
+            return self._answer_similar(question)
+
+        match = PRICE_RE.search(question)
+        if match:
+            item = self._resolve(self.json_file_tea, match.group("name"), "Название")
+            if item is not None and item.get("Цена"):
+                return f"Цена товара «{item['Название']}» — {item['Цена']} рублей."
+            return None
+
+        match = DESCRIPTION_RE.search(question)
+        if match:
+            item = self._resolve(self.json_file_tea, match.group("name"), "Название")
+            if item is not None and item.get("Описание"):
+                return item["Описание"]
+            return None
+
+        return None
+
+    # ---------------------- Заказы ----------------------
+
+    def _answer_order(self, question: str, raw_number: str) -> Optional[str]:
+        # Отвечаем сами только на справочные вопросы: состав, дата оформления, статус, доставка
+        if ORDER_COST_RE.search(question):
+            return None
+        aspect = next((name for name, regex in ORDER_ASPECTS if regex.search(question)), None)
+        if aspect is None or ORDER_REQUEST_RE.search(question):
+            return None
+
+        number_key = normalize_order_number(raw_number)
+        orders = [
+            item for _, item in self.order_backend.find(raw_number)
+            if normalize_order_number(item.get("Номер заказа", "") or "") == number_key
+        ]
+        if not orders:
+            return f"К сожалению, я не нашёл заказ с номером {raw_number.upper()}."
+        order = orders[0]
+
+        number = order.get("Номер заказа", "")
+        if aspect == "items":
+            return f"В заказ {number} входит: {order.get('Состав заказа', '')}."
+        if aspect == "created":
+            return f"Заказ {number} оформлен {order.get('Дата формирования заказа', '')}."
+        if aspect == "status":
+            return (
+                f"Заказ {number} сейчас имеет статус «{order.get('Статус доставки', '')}». "
+                f"Дата доставки — {order.get('Дата доставки', '')}."
+            )
+        return (
+            f"Дата доставки заказа {number} — {order.get('Дата доставки', '')}. "
+            f"Статус: «{order.get('Статус доставки', '')}»."
+        )
+
+    # ---------------------- Похожие товары ----------------------
+
+    def _answer_similar(self, question: str) -> Optional[str]:
+        match = QUOTED_NAME_RE.search(question) or SIMILAR_NAME_RE.search(question)
+        if not match:
+            return None
+        item = self._resolve(self.json_file_similar, match.group("name"), "Название товара")
+        if item is None or not item.get("Похожие товары"):
+            return None
+
+        similar = item["Похожие товары"]
+        similar_str = similar if isinstance(similar, str) else ", ".join(similar)
+        return f"Похожие на «{item['Название товара']}» товары: {similar_str}."
+
+    # ---------------------- Поиск товара ----------------------
+
+    @staticmethod
+    def _resolve(json_path: str, name: str, field: str) -> Optional[dict]:
+        """
+        Находит единственный товар по названию (точно, частично или с опечатками).
+        Точное совпадение названия важнее частичных; если же подходят только
+        товары с разными названиями ('Бразилия'), возвращает None.
+        """
+        catalog = catalog_store.get(json_path)
+        name = name.strip(" «»\"“”")
+        positions, _ = search_by_name(catalog, name, field)
+        exact = [pos for pos in positions if normalize_name(catalog.records[pos].get(field, "") or "") == normalize_name(name)]
+        positions = exact or positions
+        names = {normalize_name(catalog.records[pos].get(field, "") or "") for pos in positions}
+        if len(names) != 1:
+            return None
+        return catalog.records[positions[0]]
+
+
+# ====================== ПРОВЕРОЧНЫЕ ВОПРОСЫ ======================
+
+# (вопрос, должен ли роутер ответить сам); None-ответ означает, что вопрос уходит агенту.
+# Запуск из корня проекта: python backend/router.py
+CHECK_CASES: List[Tuple[str, bool]] = [
+    ("Когда доставят заказ TCH-250211-02?", True),
+    ("Какой статус доставки заказа TCH-250211-02?", True),
+    ("Что входит в заказ TCH-250211-02?", True),
+    ("Когда был оформлен заказ ТСН-250211-02?", True),
+    ("Стоимость доставки заказа TCH-250211-02", False),
+    ("Сколько стоит доставка заказа TCH-250211-02?", False),
+    ("Какая цена доставки заказа TCH-250211-02?", False),
+    ("Какая сумма заказа TCH-250211-02?", False),
+    ("Можно ли ускорить доставку заказа TCH-250211-02?", False),
+    ("Хочу вернуть заказ TCH-250211-02", False),
+]
+
+
+if __name__ == "__main__":
+    router = IntentRouter("tea_data.json", JSONOrderBackend("orders.json"), "similar_products.json")
+    failed = 0
+    for question, expected in CHECK_CASES:
+        answer = router.route(question)
+        ok = (answer is not None) == expected
+        failed += not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {question} -> {answer if answer is not None else 'агенту'}")
+    if failed:
+        raise SystemExit(f"Не прошло: {failed} из {len(CHECK_CASES)}")
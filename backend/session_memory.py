@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+
+from langchain.memory import ConversationBufferWindowMemory
+
+# Метка запросов без session_id (в трассировке и журнале разговоров); такие запросы
+# получают одноразовую память, которая нигде не хранится
+DEFAULT_SESSION_ID = "default"
+
+
+class SessionMemoryStore:
+    """
+    Память диалога отдельно для каждой сессии (session_id из запроса /bot).
+      - у каждой сессии окно из последних window ходов, поэтому промпт не растёт бесконечно;
+      - сессии, к которым не обращались idle_ttl секунд, удаляются;
+      - если сессий больше max_sessions, вытесняются самые давно неактивные;
+      - session() / asession() держат блокировку сессии: параллельные запросы одной сессии
+        выполняются по очереди, разные сессии — независимо;
+      - запрос без session_id получает свою пустую память без блокировки: анонимные клиенты
+        не видят историю друг друга и не ждут друг друга.
+    """
+    def __init__(self, window: int = 5, max_sessions: int = 1000, idle_ttl: Optional[float] = 1800):
+        self.window = window
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        # session_id -> [память, время последнего обращения, блокировка для потоков, для asyncio];
+        # порядок = от давних к свежим
+        self._sessions: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def _new_memory(self) -> ConversationBufferWindowMemory:
+        return ConversationBufferWindowMemory(
+            k=self.window,
+            memory_key="chat_history",
+            return_messages=True,
+        )
+
+    def _evict(self, now: float, keep: str) -> None:
+        """
+        Удаляет простаивающие и лишние сессии (вызывать под блокировкой).
+        Сессии, чей запрос сейчас выполняется (блокировка занята), не трогаем: иначе следующий ход
+        получил бы новую запись с новой блокировкой и пошёл бы параллельно с текущим.
+        Сессию keep (к которой сейчас обращаются) тоже не трогаем.
+        """
+        for session_id, (_, last_used, lock, alock) in list(self._sessions.items()):
+            idle = self.idle_ttl is not None and now - last_used > self.idle_ttl
+            if not idle and len(self._sessions) <= self.max_sessions:
+                break
+            if session_id == keep or lock.locked() or alock.locked():
+                continue
+            del self._sessions[session_id]
+            self.evicted += 1
+
+    def _entry(self, session_id: Optional[str]) -> list:
+        now = time.monotonic()
+        if not session_id:
+            # Анонимный запрос: одноразовая запись, в хранилище не попадает
+            return [self._new_memory(), now, threading.Lock(), asyncio.Lock()]
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                entry = [self._new_memory(), now, threading.Lock(), asyncio.Lock()]
+                self._sessions[session_id] = entry
+            else:
+                entry[1] = now
+                self._sessions.move_to_end(session_id)
+            self._evict(now, keep=session_id)
+            return entry
+
+    def _is_current(self, session_id: Optional[str], entry: list) -> bool:
+        """Запись всё ещё в хранилище: её не вытеснили, пока мы ждали блокировку."""
+        if not session_id:
+            return True
+        with self._lock:
+            return self._sessions.get(session_id) is entry
+
+    def get(self, session_id: Optional[str]) -> ConversationBufferWindowMemory:
+        """Память сессии; создаётся при первом обращении (без session_id — каждый раз новая)."""
+        return self._entry(session_id)[0]
+
+    @contextmanager
+    def session(self, session_id: Optional[str]):
+        """Память сессии под её блокировкой — на всё время обработки одного запроса."""
+        while True:
+            entry = self._entry(session_id)
+            entry[2].acquire()
+            if self._is_current(session_id, entry):
+                break
+            entry[2].release()
+        try:
+            yield entry[0]
+        finally:
+            entry[2].release()
+
+    @asynccontextmanager
+    async def asession(self, session_id: Optional[str]):
+        """То же, что session(), но для asyncio: ожидание блокировки не останавливает event loop."""
+        while True:
+            entry = self._entry(session_id)
+            await entry[3].acquire()
+            if self._is_current(session_id, entry):
+                break
+            entry[3].release()
+        try:
+            yield entry[0]
+        finally:
+            entry[3].release()
+
+    def reset(self, session_id: Optional[str]) -> None:
+        if not session_id:
+            return
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"sessions": len(self._sessions), "evicted": self.evicted}
@@ -0,0 +1,103 @@
+import json
+from typing import Any, Callable, Dict, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Маркер финального ответа в ReAct-формате (см. instruction.txt и CustomOutputParser)
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+
+# ====================== ПОТОКОВЫЙ ПОИСК "Final Answer:" ======================
+
+class FinalAnswerStreamDetector:
+    """
+    Получает текст LLM кусками (токенами) и отдаёт только то, что идёт после
+    'Final Answer:'. Маркер может прийти разрезанным на несколько токенов,
+    поэтому до его появления хранится хвост длиной len(marker) - 1.
+    """
+    def __init__(self, marker: str = FINAL_ANSWER_MARKER):
+        self.marker = marker
+        self.found = False
+        self._buffer = ""
+        self._started = False
+
+    def feed(self, chunk: str) -> str:
+        """Добавляет очередной кусок; возвращает новую часть финального ответа (или '')."""
+        if self.found:
+            if not self._started:
+                # Пробелы и перевод строки сразу после маркера не показываем
+                chunk = chunk.lstrip()
+                if not chunk:
+                    return ""
+                self._started = True
+            return chunk
+
+        self._buffer += chunk
+        idx = self._buffer.find(self.marker)
+        if idx == -1:
+            self._buffer = self._buffer[-(len(self.marker) - 1):]
+            return ""
+
+        self.found = True
+        rest = self._buffer[idx + len(self.marker):]
+        self._buffer = ""
+        return self.feed(rest) if rest else ""
+
+
+# ====================== СОБЫТИЯ ДЛЯ КЛИЕНТА ======================
+
+class StreamingEventHandler(BaseCallbackHandler):
+    """
+    Callback-обработчик агента, превращающий его работу в события для клиента:
+      - tool_start / tool_end — агент вызвал инструмент и получил результат;
+      - token — очередной кусок финального ответа GigaChat.
+    emit вызывается синхронно в потоке агента (или в event loop для async-версии).
+    """
+    # Для async-агента вызываемся прямо в event loop, а не в отдельном потоке
+    run_inline = True
+
+    def __init__(
+        self,
+        emit: Callable[[Dict[str, Any]], None],
+        detector_factory: Callable[[], FinalAnswerStreamDetector] = FinalAnswerStreamDetector,
+    ):
+        self.emit = emit
+        self.detector_factory = detector_factory
+        self.detector: Optional[FinalAnswerStreamDetector] = None
+        self.streamed = False
+        # run_id вызовов инструментов: обёртка Tool вызывает BaseTool.run, о вложенном вызове не сообщаем
+        self._tool_runs = set()
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        # Каждый вызов LLM в ReAct-цикле ищет маркер заново
+        self.detector = self.detector_factory()
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self.detector = self.detector_factory()
+
+    def on_llm_new_token(self, token: str, **kwargs):
+        if self.detector is None:
+            self.detector = self.detector_factory()
+        text = self.detector.feed(token)
+        if text:
+            self.streamed = True
+            self.emit({"event": "token", "text": text})
+
+    def on_tool_start(self, serialized, input_str, *, run_id=None, parent_run_id=None, **kwargs):
+        self._tool_runs.add(run_id)
+        if parent_run_id in self._tool_runs:
+            return
+        name = (serialized or {}).get("name") or kwargs.get("name", "")
+        self.emit({"event": "tool_start", "tool": name, "input": input_str})
+
+    def on_tool_end(self, output, *, run_id=None, parent_run_id=None, **kwargs):
+        self._tool_runs.discard(run_id)
+        if parent_run_id in self._tool_runs:
+            return
+        self.emit({"event": "tool_end", "tool": kwargs.get("name", "")})
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Событие в формате server-sent events: 'event: <тип>' + 'data: <json>'."""
+    payload = {key: value for key, value in event.items() if key != "event"}
+    return f"event: {event['event']}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
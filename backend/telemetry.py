@@ -0,0 +1,375 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# ====================== ЛОГГЕР ======================
+
+# Уровень логов сервиса: DEBUG — входы и выходы инструментов, INFO — тайминги запросов
+LOG_LEVEL = os.environ.get("BOT_LOG_LEVEL", "INFO").upper()
+
+
+def get_logger(name: str = "bot") -> logging.Logger:
+    """
+    Логгер вместо print(f"[DEBUG] ..."): сообщения ниже уровня отбрасываются
+    до форматирования строки (log.debug("... %s", value)), поэтому выключенный DEBUG почти бесплатен.
+    """
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+    return logger
+
+
+log = get_logger()
+
+
+# ====================== МЕТРИКИ (формат Prometheus) ======================
+
+# Границы корзин гистограмм задержек, секунды: от поиска по индексу до долгого ответа агента
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+ITERATION_BUCKETS = (1, 2, 3, 4, 5, 7, 10, 15, 20)
+
+
+def _format_labels(label_names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(label_names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Iterable[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Iterable[str] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # ключ меток -> [счётчики по корзинам, сумма, количество]
+        self._data: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            data = self._data.get(key)
+            if data is None:
+                data = [[0] * len(self.buckets), 0.0, 0]
+                self._data[key] = data
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[0][i] += 1
+                    break
+            data[1] += value
+            data[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._data.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.label_names, key, f'le="{bound:g}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.label_names, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total:g}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: "OrderedDict[str, Any]" = OrderedDict()
+
+    def counter(self, name: str, help_text: str, label_names: Iterable[str] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, help_text, label_names))
+
+    def histogram(self, name: str, help_text: str, label_names: Iterable[str] = (),
+                  buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help_text, label_names, buckets))
+
+    def render(self) -> str:
+        """Текст для GET /metrics (Prometheus text exposition format 0.0.4)."""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = MetricsRegistry()
+
+REQUESTS = registry.counter("bot_requests_total", "Запросы к /bot по способу ответа", ["route"])
+REQUEST_SECONDS = registry.histogram(
+    "bot_request_duration_seconds", "Время ответа на запрос /bot", ["route"]
+)
+LLM_SECONDS = registry.histogram("bot_llm_call_duration_seconds", "Время одного вызова GigaChat")
+LLM_TOKENS = registry.counter("bot_llm_tokens_total", "Токены GigaChat", ["kind"])
+TOOL_SECONDS = registry.histogram("bot_tool_call_duration_seconds", "Время вызова инструмента", ["tool"])
+TOOL_MATCHES = registry.counter("bot_tool_matches_total", "Сколько записей вернули инструменты", ["tool"])
+TOOL_SCANNED = registry.counter(
+    "bot_tool_catalog_records_total", "Размер каталога, по которому искал инструмент", ["tool"]
+)
+PARSER_SECONDS = registry.histogram("bot_parser_duration_seconds", "Время разбора ответа LLM парсером")
+AGENT_ITERATIONS = registry.histogram(
+    "bot_agent_iterations", "Число итераций ReAct-цикла на запрос", buckets=ITERATION_BUCKETS
+)
+
+
+# ====================== СПАНЫ ЗАПРОСА ======================
+
+class Span:
+    __slots__ = ("name", "kind", "start", "end", "attrs")
+
+    def __init__(self, name: str, kind: str, start: float, attrs: Dict[str, Any]):
+        self.name = name
+        self.kind = kind
+        self.start = start
+        self.end: Optional[float] = None
+        self.attrs = attrs
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+
+class RequestTrace:
+    """
+    Тайминги одного запроса /bot: спаны вызовов LLM, инструментов, парсера,
+    роутера и кеша, а также число итераций агента и токены.
+    """
+    def __init__(self, **attrs):
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.route = "agent"
+        self.iterations = 0
+        self.spans: List[Span] = []
+        # Открытые спаны по ключу (run_id LangChain или id контекстного менеджера)
+        self._open: "OrderedDict[Any, Span]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def open(self, key: Any, name: str, kind: str, **attrs) -> Span:
+        span = Span(name, kind, time.perf_counter(), attrs)
+        with self._lock:
+            self.spans.append(span)
+            self._open[key] = span
+        return span
+
+    def close(self, key: Any, **attrs) -> Optional[Span]:
+        with self._lock:
+            span = self._open.pop(key, None)
+        if span is not None:
+            span.end = time.perf_counter()
+            span.attrs.update(attrs)
+        return span
+
+    def is_open(self, key: Any) -> bool:
+        return key in self._open
+
+    def annotate(self, **attrs) -> None:
+        """Добавляет атрибуты к последнему открытому спану (например, инструменту, который сейчас работает)."""
+        with self._lock:
+            target = next(reversed(self._open.values()), None) if self._open else None
+        (target.attrs if target is not None else self.attrs).update(attrs)
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            **self.attrs,
+            "route": self.route,
+            "duration_ms": round(self.duration * 1000, 3),
+            "iterations": self.iterations,
+            "spans": [
+                {
+                    "name": span.name,
+                    "kind": span.kind,
+                    "offset_ms": round((span.start - self.start) * 1000, 3),
+                    "duration_ms": round(span.duration * 1000, 3),
+                    **span.attrs,
+                }
+                for span in self.spans
+            ],
+        }
+
+    def record_metrics(self) -> None:
+        REQUESTS.inc(route=self.route)
+        REQUEST_SECONDS.observe(self.duration, route=self.route)
+        if self.route == "agent":
+            AGENT_ITERATIONS.observe(self.iterations)
+        for span in self.spans:
+            if span.kind == "llm":
+                LLM_SECONDS.observe(span.duration)
+                LLM_TOKENS.inc(span.attrs.get("prompt_tokens", 0), kind="prompt")
+                LLM_TOKENS.inc(span.attrs.get("completion_tokens", 0), kind="completion")
+            elif span.kind == "tool":
+                TOOL_SECONDS.observe(span.duration, tool=span.name)
+                TOOL_MATCHES.inc(span.attrs.get("matches", 0), tool=span.name)
+                # Размер каталога может быть неизвестен (OrderBackend.size() -> None)
+                catalog_size = span.attrs.get("catalog_size")
+                if catalog_size is not None:
+                    TOOL_SCANNED.inc(catalog_size, tool=span.name)
+            elif span.kind == "parser":
+                PARSER_SECONDS.observe(span.duration)
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("bot_request_trace", default=None)
+
+
+@contextmanager
+def request_trace(**attrs):
+    """
+    Трассировка запроса: спаны собираются, пока блок выполняется, затем
+    попадают в метрики и одной JSON-строкой в лог (уровень INFO).
+    """
+    trace = RequestTrace(**attrs)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    except Exception as e:
+        trace.route = "error"
+        trace.attrs["error"] = str(e)
+        raise
+    finally:
+        _current_trace.reset(token)
+        trace.end = time.perf_counter()
+        trace.record_metrics()
+        if log.isEnabledFor(logging.INFO):
+            log.info("trace %s", json.dumps(trace.to_dict(), ensure_ascii=False, default=str))
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+def annotate(**attrs) -> None:
+    """Атрибуты для текущего спана; вне запроса (скрипты, тесты инструментов) ничего не делает."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.annotate(**attrs)
+
+
+def set_route(route: str) -> None:
+    """Как был получен ответ: router, cache или agent."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.route = route
+
+
+@contextmanager
+def span(name: str, kind: str, **attrs):
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    key = object()
+    opened = trace.open(key, name, kind, **attrs)
+    try:
+        yield opened
+    finally:
+        trace.close(key)
+
+
+class TraceCallbackHandler(BaseCallbackHandler):
+    """Переводит события агента (LLM, инструменты, шаги ReAct) в спаны RequestTrace."""
+    # Вызываемся прямо в потоке агента / event loop: запись спана дешевле, чем передача в пул
+    run_inline = True
+
+    def __init__(self, trace: RequestTrace):
+        self.trace = trace
+
+    # ---------------------- LLM ----------------------
+
+    def on_chat_model_start(self, serialized, messages, *, run_id=None, **kwargs):
+        self.trace.open(run_id, "llm", "llm")
+
+    def on_llm_start(self, serialized, prompts, *, run_id=None, **kwargs):
+        self.trace.open(run_id, "llm", "llm")
+
+    def on_llm_end(self, response, *, run_id=None, **kwargs):
+        prompt_tokens, completion_tokens = _token_usage(response)
+        self.trace.close(run_id, prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+    def on_llm_error(self, error, *, run_id=None, **kwargs):
+        self.trace.close(run_id, error=str(error))
+
+    # ---------------------- Инструменты ----------------------
+
+    def on_tool_start(self, serialized, input_str, *, run_id=None, parent_run_id=None, **kwargs):
+        # Обёртка Tool вызывает BaseTool.run: вложенный вызов — тот же инструмент, отдельный спан не нужен
+        if self.trace.is_open(parent_run_id):
+            return
+        name = (serialized or {}).get("name") or kwargs.get("name", "tool")
+        self.trace.open(run_id, name, "tool")
+
+    def on_tool_end(self, output, *, run_id=None, **kwargs):
+        self.trace.close(run_id)
+
+    def on_tool_error(self, error, *, run_id=None, **kwargs):
+        self.trace.close(run_id, error=str(error))
+
+    # ---------------------- Шаги агента ----------------------
+
+    def on_agent_action(self, action, **kwargs):
+        self.trace.iterations += 1
+
+    def on_agent_finish(self, finish, **kwargs):
+        self.trace.iterations += 1
+
+
+def _token_usage(response) -> Tuple[int, int]:
+    """Токены запроса и ответа: из usage_metadata сообщения или llm_output['token_usage']."""
+    prompt_tokens = completion_tokens = 0
+    for generations in response.generations or []:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+    if not (prompt_tokens or completion_tokens):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+    return prompt_tokens, completion_tokens
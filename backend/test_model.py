@@ -7,8 +7,8 @@ import json
 # LangChain импорт
 from langchain.docstore.document import Document
 
-# Модель GigaChat (кастомный класс)
-from langchain_gigachat.chat_models import GigaChat
+# Модель GigaChat (общий клиент, см. gigachat_client.py)
+from gigachat_client import get_chat_model
 
 # Prompt, инструменты и агенты
 from langchain.prompts import PromptTemplate
@@ -298,29 +298,24 @@ REACT_PROMPT_TEMPLATE = """
 
 # ====================== ОСНОВНОЙ КЛАСС ДЛЯ ОБРАБОТКИ ЗАПРОСОВ ======================
 
+# Предел шагов ReAct-агента, как у агента в app.py (переопределяется флагом --max-iterations)
+MAX_ITERATIONS = 20
+
+
 class LangChainQueryProcessor:
     """
     Класс, инкапсулирующий логику чтения JSON, создания ReAct-агента и общения через него.
     """
-    def __init__(self, json_file_tea, json_file_orders, json_file_similar):
+    def __init__(self, json_file_tea, json_file_orders, json_file_similar, max_iterations=MAX_ITERATIONS):
+        self.max_iterations = max_iterations
         # Установим заголовок для GigaChat (при необходимости)
         headers = {
             "X-Session-ID": "8324244b-7133-4d30-a328-31d8466e5503",
         }
         gigachat.context.session_id_cvar.set(headers.get("X-Session-ID"))
 
-        # Токен для GigaChat (пример, у вас может быть свой)
-        GIGACHAT_CREDENTIALS = (
-            "ZWExMmU1NmUtZjhhNS00M2UxLWJlOGEtNGNhMjIwZWU2Zjc3OmIxMDIyNjZhLThjNmItNDM2NS1hNmI0LTY2ZTkyNTRiZGI1Yw=="
-        )
-
-        # Создаём саму модель GigaChat
-        self.model = GigaChat(
-            credentials=GIGACHAT_CREDENTIALS,
-            scope="GIGACHAT_API_PERS",
-            model="GigaChat-2-Max",
-            verify_ssl_certs=False,
-        )
+        # Модель GigaChat из общей фабрики процесса: пул соединений и токен, обновляемый в фоне
+        self.model = get_chat_model("GigaChat-2-Max")
 
         # Инициализируем три инструмента
         self.json_name_search_tool = JSONNameSearchTool(json_path=json_file_tea)
@@ -373,7 +368,7 @@ class LangChainQueryProcessor:
             memory=self.memory,
             verbose=True,
             handle_parsing_errors=True,
-            max_iterations=10
+            max_iterations=self.max_iterations
         )
 
     def process_query_with_agent(self, user_input: str) -> str:
@@ -382,6 +377,22 @@ class LangChainQueryProcessor:
         response = result["output"]
         return response
 
+    def process_query_isolated(self, user_input: str) -> str:
+        """
+        Ответ на один вопрос без общей истории: для каждого вызова свои executor и память.
+        Агент и модель общие — они не хранят состояние, поэтому вопросы можно гонять параллельно.
+        """
+        executor = AgentExecutor.from_agent_and_tools(
+            agent=self.agent,
+            tools=self.tools,
+            memory=ConversationBufferMemory(memory_key="chat_history", return_messages=True),
+            # Вывод нескольких параллельных агентов всё равно перемешался бы
+            verbose=False,
+            handle_parsing_errors=True,
+            max_iterations=self.max_iterations
+        )
+        return executor({"input": user_input})["output"]
+
 
 # ====================== ИНИЦИАЛИЗАЦИЯ НАШЕГО КЛАССА (ПУТИ К JSON) ======================
 
@@ -401,37 +412,48 @@ file_search = LangChainQueryProcessor(
 if __name__ == "__main__":
     """
     Пример использования:
-    1) В файле test_data.json должен быть список объектов, где у каждого есть поле "Вопрос" (и, если нужно, "Эталонный ответ").
+    1) В файле с вопросами должен быть список объектов, где у каждого есть поле "Вопрос" (и, если нужно, "Эталонный ответ").
        Пример:
          [
            { "Вопрос": "Расскажи про Эрл Грей" },
            { "Вопрос": "Похожие товары на Иван чай листовой" }
          ]
 
-    2) Запустите этот скрипт. Он прочитает test_data.json, прогонит вопросы через модель GigaChat
-       и создаст файл test_data_result.json, где будут поля: "Вопрос" и "Ответ модели".
+    2) Запустите этот скрипт. Он прогонит вопросы через модель GigaChat параллельно (--workers)
+       и создаст файл с полями "Вопрос" и "Ответ модели":
+         python backend/test_model.py                       -> questions/tea_data_questions.json в test_data_result.json
+         python backend/test_model.py questions/*.json      -> <имя набора>_result.json для каждого файла
+       Если прогон прервался, повторный запуск продолжит с места остановки (см. batch_eval.py).
     """
-    # Загружаем тестовые данные
-    with open(r"questions\tea_data_questions.json", "r", encoding="utf-8") as f:
-        test_data = json.load(f)
-
-    results = []
-    for entry in test_data:
-        question = entry.get("Вопрос", "").strip()
-        if not question:
-            continue
-
-        # Получаем ответ от модели
-        model_answer = file_search.process_query_with_agent(question)
-
-        # Сохраняем результат
-        results.append({
-            "Вопрос": question,
-            "Ответ модели": model_answer
-        })
-
-    # Записываем в итоговый JSON
-    with open("test_data_result.json", "w", encoding="utf-8") as f:
-        json.dump(results, f, ensure_ascii=False, indent=2)
-
-    print("Готово! Результаты сохранены в test_data_result.json.")
+    import argparse
+    from batch_eval import load_questions, run_batch
+
+    parser = argparse.ArgumentParser(description="Пакетный прогон вопросов через агента")
+    parser.add_argument("questions", nargs="*", default=[os.path.join("questions", "tea_data_questions.json")])
+    parser.add_argument("--output", help="Файл результата (только для одного набора вопросов)")
+    parser.add_argument("--workers", type=int, default=4, help="Сколько вопросов обрабатывать одновременно")
+    parser.add_argument("--retries", type=int, default=3, help="Повторов при ошибке GigaChat")
+    parser.add_argument("--rate", type=float, default=2.0, help="Не больше стольких новых вопросов в секунду")
+    parser.add_argument("--max-iterations", type=int, default=MAX_ITERATIONS, help="Предел шагов агента на вопрос")
+    args = parser.parse_args()
+    file_search.max_iterations = args.max_iterations
+
+    for questions_path in args.questions:
+        if args.output and len(args.questions) == 1:
+            output_path = args.output
+        elif questions_path == parser.get_default("questions")[0]:
+            output_path = "test_data_result.json"
+        else:
+            output_path = os.path.splitext(os.path.basename(questions_path))[0] + "_result.json"
+
+        print(f"Набор {questions_path} -> {output_path}")
+        run_batch(
+            load_questions(questions_path),
+            file_search.process_query_isolated,
+            output_path,
+            workers=args.workers,
+            retries=args.retries,
+            rate=args.rate,
+        )
+
+    print("Готово!")
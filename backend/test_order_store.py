@@ -0,0 +1,44 @@
+from order_store import JSONOrderBackend, OrderBackend, SQLiteOrderBackend, import_orders_from_json
+from telemetry import TOOL_MATCHES, TOOL_SCANNED, annotate, request_trace, span
+
+# Запуск из корня проекта: python -m pytest backend/test_order_store.py
+
+ORDERS_JSON = "orders.json"
+TOOL = "json_order_search"
+
+
+def _lookup(backend: OrderBackend, query: str):
+    """Поиск заказа так же, как в JSONOrderSearchTool._run: внутри спана инструмента с телеметрией."""
+    with request_trace(question=query) as trace:
+        with span(TOOL, "tool"):
+            orders = backend.find(query, limit=20)
+            annotate(catalog_size=backend.size(), matches=len(orders))
+    return orders, trace
+
+
+def test_sqlite_order_lookup_with_telemetry(tmp_path):
+    db_path = str(tmp_path / "orders.db")
+    count = import_orders_from_json(ORDERS_JSON, db_path)
+    backend = SQLiteOrderBackend(db_path)
+    assert backend.size() == count == JSONOrderBackend(ORDERS_JSON).size()
+
+    scanned = TOOL_SCANNED.value(tool=TOOL)
+    matches = TOOL_MATCHES.value(tool=TOOL)
+    orders, trace = _lookup(backend, "что с моим заказом TCH-250211-02")
+
+    assert [item["Номер заказа"] for _, item in orders] == ["TCH-250211-02"]
+    assert trace.spans[0].attrs == {"catalog_size": count, "matches": 1}
+    assert TOOL_SCANNED.value(tool=TOOL) == scanned + count
+    assert TOOL_MATCHES.value(tool=TOOL) == matches + 1
+
+
+def test_unknown_catalog_size_is_not_counted():
+    class NoSizeBackend(OrderBackend):
+        def find(self, query, limit=None):
+            return []
+
+    scanned = TOOL_SCANNED.value(tool=TOOL)
+    orders, trace = _lookup(NoSizeBackend(), "TCH-250211-02")
+
+    assert orders == [] and trace.route != "error"
+    assert TOOL_SCANNED.value(tool=TOOL) == scanned
@@ -7,6 +7,13 @@ const SimpleBot = () => {
   const [userInput, setUserInput] = useState('');
   // Состояние для отображения процесса «размышления»
   const [isLoading, setIsLoading] = useState(false);
+  const [loadingText, setLoadingText] = useState('Подождите, менеджер думает...');
+  // Идентификатор сессии: бэкенд хранит историю диалога отдельно для каждой вкладки
+  const [sessionId] = useState(() =>
+    window.crypto && window.crypto.randomUUID
+      ? window.crypto.randomUUID()
+      : `${Date.now()}-${Math.random().toString(36).slice(2)}`
+  );
 
   // Функция для обработки отправки сообщения
   const handleSendMessage = async () => {
@@ -20,34 +27,80 @@ const SimpleBot = () => {
       setMessages((prevMessages) => [...prevMessages, newMessage]);
       setUserInput('');
       // Включаем индикатор загрузки
+      setLoadingText('Подождите, менеджер думает...');
       setIsLoading(true);
 
       try {
-        // Отправляем запрос к бэкенду
-        const response = await fetch('http://127.0.0.1:5000/bot', {
+        // Отправляем запрос к потоковому эндпоинту: ответ приходит по частям (server-sent events)
+        const response = await fetch('http://127.0.0.1:5000/bot/stream', {
           method: 'POST',
           headers: {
             'Content-Type': 'application/json',
           },
-          body: JSON.stringify({ message: userInput }),
+          body: JSON.stringify({ message: userInput, session_id: sessionId }),
         });
 
-        const data = await response.json();
-
-        if (response.ok) {
-          // Ответ бота
-          const botResponse = {
-            text: data.response,
-            sender: 'bot',
-          };
-          setMessages((prevMessages) => [...prevMessages, botResponse]);
-        } else {
+        if (!response.ok || !response.body) {
           // Если ошибка
           const errorResponse = {
             text: 'Что-то пошло не так. Попробуйте еще раз.',
             sender: 'bot',
           };
           setMessages((prevMessages) => [...prevMessages, errorResponse]);
+          return;
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder('utf-8');
+        let buffer = '';
+        let botText = '';
+        let botMessageAdded = false;
+
+        // Показываем ответ бота по мере поступления: первое событие добавляет сообщение, следующие обновляют его
+        const showBotText = (text) => {
+          botText = text;
+          if (!botMessageAdded) {
+            botMessageAdded = true;
+            setIsLoading(false);
+            setMessages((prevMessages) => [...prevMessages, { text, sender: 'bot' }]);
+          } else {
+            setMessages((prevMessages) => [
+              ...prevMessages.slice(0, -1),
+              { text, sender: 'bot' },
+            ]);
+          }
+        };
+
+        const handleEvent = (eventName, data) => {
+          if (eventName === 'tool_start') {
+            setLoadingText('Ищу информацию в каталоге...');
+          } else if (eventName === 'token') {
+            showBotText(botText + data.text);
+          } else if (eventName === 'done') {
+            // Итоговый ответ целиком (например, если он пришёл без стриминга)
+            showBotText(data.response);
+          } else if (eventName === 'error') {
+            showBotText('Что-то пошло не так. Попробуйте еще раз.');
+          }
+        };
+
+        while (true) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += decoder.decode(value, { stream: true });
+
+          // События разделены пустой строкой: "event: <тип>\ndata: <json>\n\n"
+          const chunks = buffer.split('\n\n');
+          buffer = chunks.pop();
+          for (const chunk of chunks) {
+            let eventName = 'message';
+            let dataLine = '';
+            for (const line of chunk.split('\n')) {
+              if (line.startsWith('event: ')) eventName = line.slice(7);
+              else if (line.startsWith('data: ')) dataLine += line.slice(6);
+            }
+            handleEvent(eventName, dataLine ? JSON.parse(dataLine) : {});
+          }
         }
       } catch (error) {
         // В случае сбоя запроса
@@ -137,7 +190,7 @@ const SimpleBot = () => {
                   backgroundColor: '#fff3cd',
                 }}
               >
-                Подождите, менеджер думает...
+                {loadingText}
               </p>
             </div>
           )}